@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import time
+import threading
 from flask import Flask
 from flask.ext.cors import CORS
 
 from src.core.segmenter import Segmenter
 from src.core.tagger import Tagger
 from src.core.ner_tagger import NerTagger
+from src.core.loading import load_models
+from src.core.engine import TaggingEngine
+from src.core.result_cache import ResultCache, CachingTagger
 from src.di import DependencyContainer
+from src.job_runner import JobRunner
+from src.archiver import Archiver, FileStore, SegmentStore
+from src.model_registry import ModelRegistry
 
 # from src.core.lexicon import Lexicon
 # from src.core.segmenter import Segmenter
@@ -28,22 +36,111 @@ def init():
     app.secret_key = 'super secret key'
     app.config['SESSION_TYPE'] = 'filesystem'
     app.config['UPLOAD_FOLDER'] = os.path.dirname(os.path.realpath(__file__)) + '/uploads/'
+    # Number of tagging worker processes, 0 tags in the request thread
+    app.config['TAGGING_PROCESSES'] = int(os.environ.get('TAGGING_PROCESSES', 0))
+    # Number of background threads per process running asynchronous tagging jobs
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 1))
+    # Days finished jobs and their results are kept for
+    app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+    # Start the job runner in the factory, so queued jobs resume after a restart. Forked server processes start
+    # their own runner on their first request.
+    app.config['JOB_RUNNER_AUTOSTART'] = os.environ.get('JOB_RUNNER_AUTOSTART', '1') == '1'
+    # Load all models in the application factory, before the server forks its workers
+    app.config['PRELOAD_MODELS'] = os.environ.get('PRELOAD_MODELS', '1') == '1'
+    # Archive store of the request results, 'segments' (hourly segments with an index) or 'files' (a file per request)
+    app.config['ARCHIVE_STORE'] = os.environ.get('ARCHIVE_STORE', 'segments')
+    # Gzip the archived request results of the files store, segments are always compressed
+    app.config['ARCHIVE_COMPRESS'] = os.environ.get('ARCHIVE_COMPRESS', '0') == '1'
+    # Size of the in-memory tier of the result cache in megabytes, 0 disables the cache
+    app.config['RESULT_CACHE_MB'] = int(os.environ.get('RESULT_CACHE_MB', 256))
+    # Path of the on-disk tier of the result cache, shared by all processes, and its size in megabytes
+    app.config['RESULT_CACHE_DISK'] = os.environ.get('RESULT_CACHE_DISK') or None
+    app.config['RESULT_CACHE_DISK_MB'] = int(os.environ.get('RESULT_CACHE_DISK_MB', 1024))
+    # Retention of the segments store, in megabytes and days (0 keeps everything)
+    app.config['ARCHIVE_MAX_MB'] = int(os.environ.get('ARCHIVE_MAX_MB', 10240))
+    app.config['ARCHIVE_MAX_DAYS'] = int(os.environ.get('ARCHIVE_MAX_DAYS', 90))
+    # Maximum number of documents and of characters in all documents of a batch request (0 unbounded)
+    app.config['BATCH_MAX_DOCUMENTS'] = int(os.environ.get('BATCH_MAX_DOCUMENTS', 1000))
+    app.config['BATCH_MAX_CHARS'] = int(os.environ.get('BATCH_MAX_CHARS', 10000000))
+    # Comma separated languages served, their models are loaded on first use unless they are preloaded
+    app.config['LANGUAGES'] = os.environ.get('LANGUAGES', 'sl').split(',')
+    # Memory budget of the loaded models in megabytes, least recently used languages are unloaded beyond it (0 never)
+    app.config['MODELS_MAX_MB'] = int(os.environ.get('MODELS_MAX_MB', 0))
 
     CORS(app)
 
     print 'Initializing models'
-    dc = DependencyContainer(lazy=False)
-    for lang in ['sl']: #['hr', 'sl', 'sr']:
-        dc['segmenter.' + lang] = lambda: Segmenter(lang)
-        dc['tagger.' + lang] = lambda: Tagger(lang, dc['segmenter.' + lang])
-        dc['ner_tagger.' + lang] = lambda: NerTagger(lang, dc['tagger.' + lang])
-
+    dc = DependencyContainer(lazy=not app.config['PRELOAD_MODELS'])
+
+    result_cache = None
+    if app.config['RESULT_CACHE_MB'] > 0:
+        result_cache = ResultCache(app.config['RESULT_CACHE_MB'] * 1024 * 1024, app.config['RESULT_CACHE_DISK'],
+                                   app.config['RESULT_CACHE_DISK_MB'] * 1024 * 1024)
+
+    def load_language(lang):
+        model_paths = Segmenter.model_paths(lang) + Tagger.model_paths(lang) + NerTagger.model_paths(lang)
+        # Taken before the models are read, results of models read from changed files get a new version
+        version = CachingTagger.modelVersion(model_paths)
+        # The memory of the models is estimated by the size of their files
+        model_bytes = sum(os.path.getsize(path) for path in model_paths if os.path.exists(path))
+        if app.config['TAGGING_PROCESSES'] > 0 and not app.config['PRELOAD_MODELS']:
+            # The worker processes load the taggers themselves, a copy each
+            model_bytes *= app.config['TAGGING_PROCESSES']
+            start = time.time()
+            segmenter = Segmenter(lang)
+            phases = {'tokenizer': time.time() - start}
+            ner_tagger = TaggingEngine(lang, segmenter, app.config['TAGGING_PROCESSES'])
+        else:
+            loaded = load_models(lang)
+            segmenter, ner_tagger, phases = loaded['segmenter'], loaded['ner_tagger'], loaded['phases']
+            if app.config['TAGGING_PROCESSES'] > 0:
+                ner_tagger = TaggingEngine(lang, segmenter, app.config['TAGGING_PROCESSES'], ner_tagger=ner_tagger)
+        if result_cache is not None:
+            result_cache.setVersion(lang, version)
+            ner_tagger = CachingTagger(ner_tagger, lang, version, result_cache)
+        return {'segmenter': segmenter, 'ner_tagger': ner_tagger, 'phases': phases, 'model_bytes': model_bytes}
+
+    models = ModelRegistry(app.config['LANGUAGES'], load_language, app.config['MODELS_MAX_MB'] * 1024 * 1024 or None)
+    dc['models'] = lambda: models
+    if app.config['PRELOAD_MODELS']:
+        if app.config['TAGGING_PROCESSES'] > 0:
+            # Tagging pools are forked while they are built, never while other threads are loading models
+            for lang in app.config['LANGUAGES']:
+                models.load(lang)
+        else:
+            # Languages are loaded in parallel, every one of them by a single thread
+            threads = [threading.Thread(target=models.load, args=(lang,)) for lang in app.config['LANGUAGES']]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for lang, stats in sorted(models.stats()['languages'].items()):
+            if stats['loaded']:
+                print '{0}: {1}'.format(lang, ', '.join('{0} {1:.2f} s'.format(phase, seconds)
+                                                        for phase, seconds in sorted(stats['phases'].items())))
+
+    dc['job_runner'] = lambda: JobRunner(dc, app.config['JOB_WORKERS'],
+                                         retention=app.config['JOB_RETENTION_DAYS'] * 86400)
+    if app.config['ARCHIVE_STORE'] == 'files':
+        dc['archiver'] = lambda: Archiver(FileStore(app.config['UPLOAD_FOLDER'], app.config['ARCHIVE_COMPRESS']))
+    else:
+        dc['archiver'] = lambda: Archiver(SegmentStore(os.path.join(app.config['UPLOAD_FOLDER'], 'archive'),
+                                                       app.config['ARCHIVE_MAX_MB'] * 1024 * 1024 or None,
+                                                       app.config['ARCHIVE_MAX_DAYS'] * 86400 or None))
 
     print 'Models initialized'
 
     api_router = ApiRouter(dc)
     app.register_blueprint(api_router, url_prefix='/api/v1')
 
+    if app.config['JOB_RUNNER_AUTOSTART']:
+        dc['job_runner'].start()
+
+    @app.before_request
+    def start_job_runner():
+        # Threads do not survive a fork, the runner is started again in every forked server process
+        dc['job_runner'].start()
+
 
     @app.errorhandler(Exception)
     def handle_error(error):
@@ -7,15 +7,24 @@ from tools.dbtools.reset_db import ResetDB
 
 from tools.usertools.create_user import CreateUserCommand
 from tools.usertools.delete_user import DeleteUserByUsernameCommand
+from tools.usertools.block_user import BlockUserByUsernameCommand
 from tools.usertools.get_user import GetUserByUsernameCommand
 from tools.usertools.login_user import LoginUserWithCredentials
 
+from tools.benchmarks.auth_lookup import AuthLookupBenchmark
+from tools.benchmarks.tokenizer import TokenizerBenchmark
+from tools.benchmarks.sentence_split import SentenceSplitBenchmark
+
 application = Application()
 application.add(CreateUserCommand())
 application.add(GetUserByUsernameCommand())
 application.add(DeleteUserByUsernameCommand())
+application.add(BlockUserByUsernameCommand())
 application.add(LoginUserWithCredentials())
 application.add(ResetDB())
+application.add(AuthLookupBenchmark())
+application.add(TokenizerBenchmark())
+application.add(SentenceSplitBenchmark())
 
 if __name__ == '__main__':
     application.run()
\ No newline at end of file
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import gzip
+import json
+import time
+import Queue
+import atexit
+import threading
+import traceback
+from StringIO import StringIO
+from datetime import datetime
+
+from .helpers import TSV
+from .core.sentence import Sentence
+from .db.archive_db import ArchiveDB
+
+
+class FileStore(object):
+    '''
+    Stores the tagged sentences of every request as a TSV file named by the request id, in a folder per day.
+    Files written by a batch stay open until the batch is synced.
+    '''
+
+    def __init__(self, folder, compress=False):
+        '''
+        @param folder: folder of the archive
+        @type folder: string
+        @param compress: whether the files are gzip compressed
+        @type compress: bool
+        '''
+        self.folder = folder
+        self.compress = compress
+        # path -> (raw file, file written to)
+        self._open = {}
+
+    def path(self, request_id, received):
+        name = re.sub(r'[^\w.-]', '_', request_id) + ('.tsv.gz' if self.compress else '.tsv')
+        return os.path.join(self.folder, received.strftime('%Y-%m-%d'), name)
+
+    def write(self, request_id, sentences, append, received, user_id=None):
+        """
+        Writes sentences of a request, appends them to the sentences already written if append is set
+        """
+        path = self.path(request_id, received)
+        if path in self._open and not append:
+            self._close(path)
+
+        if path not in self._open:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            raw = open(path, 'ab' if append else 'wb')
+            # Appending adds a gzip member, readers decompress consecutive members as one stream
+            f = gzip.GzipFile(fileobj=raw, mode='ab' if append else 'wb') if self.compress else raw
+            self._open[path] = (raw, f)
+
+        f = self._open[path][1]
+        for line in TSV(sentences, tag_idx=1):
+            f.write(line.encode('utf-8'))
+
+    def sync(self):
+        """
+        Closes the files written since the last sync and flushes them to disk
+        """
+        for path in self._open.keys():
+            self._close(path)
+
+    def _close(self, path):
+        raw, f = self._open.pop(path)
+        if f is not raw:
+            f.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+        raw.close()
+
+
+class SegmentStore(object):
+    '''
+    Appends the tagged sentences of requests to hourly segment files, gzip compressed JSONL with a gzip member
+    per archived part. An index database maps the request ids of a user to the offsets of their parts, so
+    results are looked up without scanning the archive. Every process appends to its own segments.
+    Segments older than max_age or beyond max_bytes in total are deleted, oldest first.
+    '''
+
+    # Seconds between two retention runs
+    RETENTION_INTERVAL = 60
+
+    def __init__(self, folder, max_bytes=None, max_age=None):
+        '''
+        @param folder: folder of the segments and the index
+        @type folder: string
+        @param max_bytes: maximum size of all segments, unbounded if None
+        @type max_bytes: int
+        @param max_age: maximum age of a segment in seconds, unbounded if None
+        @type max_age: int
+        '''
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.db = ArchiveDB(os.path.join(folder, 'index'))
+        self._segment = None
+        self._file = None
+        # Index rows and replaced requests not yet committed
+        self._rows = []
+        self._replaced = []
+        self._lastRetention = 0
+
+    def segmentName(self, now):
+        return now.strftime('%Y%m%d%H') + '-' + str(os.getpid()) + '.jsonl.gz'
+
+    def write(self, request_id, sentences, append, received, user_id=None):
+        """
+        Appends sentences of a request to the current segment, they replace earlier results of the same request id
+        unless append is set
+        """
+        name = self.segmentName(datetime.now())
+        if name != self._segment:
+            self._closeSegment()
+            self._segment = name
+            self._file = open(os.path.join(self.folder, name), 'ab')
+
+        record = {
+            'request_id': request_id,
+            'sentences': [sentence.rows() for sentence in sentences]
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        buf = StringIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as member:
+            member.write((line.encode('utf-8') if isinstance(line, unicode) else line) + '\n')
+        data = buf.getvalue()
+
+        offset = self._file.tell()
+        self._file.write(data)
+
+        if not append:
+            self._rows = [row for row in self._rows if row[:2] != (user_id, request_id)]
+            self._replaced.append((request_id, user_id))
+        self._rows.append((user_id, request_id, name, offset, len(data), received))
+
+    def sync(self):
+        """
+        Flushes the current segment to disk and commits the index rows of the parts written since the last sync
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+        if self._rows or self._replaced:
+            self.db.transaction([
+                ("DELETE FROM parts WHERE request_id = ? AND user_id IS ?", self._replaced),
+                ("INSERT INTO parts (user_id, request_id, segment, offset, length, received) VALUES (?, ?, ?, ?, ?, ?)",
+                 self._rows)
+            ])
+            self._rows = []
+            self._replaced = []
+
+        if time.time() - self._lastRetention >= SegmentStore.RETENTION_INTERVAL:
+            self._lastRetention = time.time()
+            self.enforceRetention()
+
+    def read(self, request_id, user_id=None):
+        """
+        Returns the archived sentences of a request, None if the request is not archived
+        """
+        rows = self.db.query("SELECT segment, offset, length FROM parts WHERE request_id = ? AND user_id IS ? ORDER BY id",
+                             (request_id, user_id))
+        if len(rows) == 0:
+            return None
+
+        sentences = []
+        try:
+            for row in rows:
+                with open(os.path.join(self.folder, row['segment']), 'rb') as f:
+                    f.seek(row['offset'])
+                    data = f.read(row['length'])
+                record = json.loads(gzip.GzipFile(fileobj=StringIO(data)).read().decode('utf-8'))
+                for sentence in record['sentences']:
+                    sentences.append(Sentence.fromRows(sentence))
+        except IOError:
+            # The segment has been removed by the retention
+            return None
+
+        return sentences
+
+    def enforceRetention(self):
+        """
+        Deletes the segments which are too old or exceed the size limit, oldest first. Segments still open are
+        neither deleted nor counted: the one of this process and those of the current hour, which every process
+        appends to.
+        """
+        if self.max_bytes is None and self.max_age is None:
+            return
+
+        hour = datetime.now().strftime('%Y%m%d%H')
+        segments = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.jsonl.gz') and name != self._segment and not name.startswith(hour):
+                try:
+                    stat = os.stat(os.path.join(self.folder, name))
+                except OSError:
+                    continue
+                segments.append((stat.st_mtime, stat.st_size, name))
+        segments.sort()
+
+        total = sum(size for mtime, size, name in segments)
+        now = time.time()
+        removed = []
+        for mtime, size, name in segments:
+            expired = self.max_age is not None and now - mtime > self.max_age
+            oversized = self.max_bytes is not None and total > self.max_bytes
+            if not expired and not oversized:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                # Removed by another process
+                pass
+            total -= size
+            removed.append((name,))
+
+        if removed:
+            self.db.commandMany("DELETE FROM parts WHERE segment = ?", removed)
+
+    def _closeSegment(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class Archiver(object):
+    '''
+    Archives the tagged sentences of requests in a background thread, so the client does not wait for the disk.
+    Queued writes are taken in batches, which are synced to disk once.
+    '''
+
+    # Maximum number of queued writes synced together
+    BATCH_SIZE = 100
+
+    def __init__(self, store, batch_size=BATCH_SIZE):
+        '''
+        @param store: store the sentences are written to
+        @type store: FileStore or SegmentStore
+        @param batch_size: maximum number of queued writes synced together
+        @type batch_size: int
+        '''
+        self.store = store
+        self.batch_size = batch_size
+        self.queue = Queue.Queue()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def archive(self, request_id, sentences, append=False, received=None, user_id=None):
+        """
+        Queues the tagged sentences of a request. Sentences of a streamed request are archived in parts, every
+        part after the first one is appended.
+        """
+        self.start()
+        self.queue.put((request_id, sentences, append, received or datetime.now(), user_id))
+
+    def read(self, request_id, user_id=None):
+        """
+        Returns the archived sentences of a request of a user, None if they are not archived
+        """
+        if not hasattr(self.store, 'read'):
+            raise ValueError('The archive does not support lookups')
+        return self.store.read(request_id, user_id)
+
+    def start(self):
+        """
+        Starts the writer thread. Threads do not survive a fork, so it is started on first use in each process.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            # Writes queued by the parent process are written by the parent
+            self.queue = Queue.Queue()
+            thread = threading.Thread(target=self._work, name='archiver')
+            thread.daemon = True
+            thread.start()
+            atexit.register(self.join)
+
+    def join(self):
+        """
+        Waits until every queued write is on disk
+        """
+        self.queue.join()
+
+    def _work(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            for item in batch:
+                try:
+                    self.store.write(*item)
+                except Exception:
+                    traceback.print_exc()
+
+            try:
+                self.store.sync()
+            except Exception:
+                traceback.print_exc()
+
+            for item in batch:
+                self.queue.task_done()
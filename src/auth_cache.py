@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+from datetime import datetime
+
+from .models.user_model import UserModel
+from .models.auth_token_model import AuthTokenModel
+from .request_accounting import RequestAccounting
+
+
+class AuthCache(object):
+    '''
+    In-process cache of validated authentication tokens and their users, so authenticating a request does not
+    query the database. Requests are counted on the cached users by RequestAccounting.
+    This class is a singleton.
+    '''
+    _instance = None
+
+    # Seconds a validated token is trusted before it is read from the database again
+    TTL = 60
+
+    # Seconds between two checks of the invalidation marker touched by the user tools
+    CHECK_INTERVAL = 1.0
+
+    @staticmethod
+    def getInstance():
+        """
+        Returns the singleton cache instance.
+        """
+        if AuthCache._instance is None:
+            AuthCache._instance = AuthCache()
+
+        return AuthCache._instance
+
+    @staticmethod
+    def markerPath():
+        """
+        Returns the path of the file whose modification time signals that cached users are stale
+        """
+        assetsPath = os.path.realpath(os.path.dirname(os.path.realpath(__file__)) + '/../assets/')
+        return assetsPath + '/users.invalidated'
+
+    @staticmethod
+    def notify():
+        """
+        Signals every process to drop its cached tokens and users, used when a user is blocked or deleted
+        """
+        with open(AuthCache.markerPath(), 'a'):
+            os.utime(AuthCache.markerPath(), None)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # token string -> (cache expiration, token expiration, user id)
+        self._tokens = {}
+        # user id -> UserModel
+        self._users = {}
+        self.accounting = RequestAccounting.getInstance()
+        self._lastCheck = 0
+        self._markerMtime = self._readMarker()
+
+    def _readMarker(self):
+        try:
+            return os.path.getmtime(AuthCache.markerPath())
+        except OSError:
+            return None
+
+    def _checkMarker(self):
+        now = time.time()
+        if now - self._lastCheck < AuthCache.CHECK_INTERVAL:
+            return
+
+        self._lastCheck = now
+        mtime = self._readMarker()
+        if mtime != self._markerMtime:
+            self._markerMtime = mtime
+            self.invalidate()
+
+    def getUser(self, token_string):
+        """
+        Returns the user of a valid token, None if the token is unknown or expired
+        """
+        with self._lock:
+            self._checkMarker()
+            entry = self._tokens.get(token_string)
+            if entry is None or entry[0] < time.time():
+                entry = self._load(token_string)
+                if entry is None:
+                    self._tokens.pop(token_string, None)
+                    return None
+
+            expiration, token_expiration, user_id = entry
+            if token_expiration is not None and token_expiration <= datetime.now():
+                del self._tokens[token_string]
+                return None
+
+            return self._users.get(user_id)
+
+    def _load(self, token_string):
+        authToken = AuthTokenModel.getByAttributeSingle('token', token_string)
+        if authToken is None or not authToken.isValid():
+            return None
+
+        # Pending requests of the cached user are written before it is reloaded
+        if self.accounting.hasPending(authToken.user_id):
+            self.accounting.flush()
+
+        user = UserModel.getByPk(authToken.user_id)
+        if user is None:
+            return None
+
+        entry = (time.time() + AuthCache.TTL, authToken.expiration_timestamp, user.id)
+        self._tokens[token_string] = entry
+        self._users[user.id] = user
+        return entry
+
+    def logRequest(self, user, count=1):
+        """
+        Counts count requests of a cached user, returns False if they exceed the monthly limit
+        """
+        with self._lock:
+            return self.accounting.logRequest(user, count)
+
+    def flush(self):
+        """
+        Writes the pending request counts
+        """
+        self.accounting.flush()
+
+    def invalidateUser(self, user_id):
+        """
+        Drops the cached tokens of a user
+        """
+        with self._lock:
+            if self.accounting.hasPending(user_id):
+                self.accounting.flush()
+            self._tokens = dict([(k, v) for k, v in self._tokens.iteritems() if v[2] != user_id])
+            self._users.pop(user_id, None)
+
+    def invalidate(self):
+        """
+        Drops all cached tokens and users
+        """
+        with self._lock:
+            self.flush()
+            self._tokens.clear()
+            self._users.clear()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import marisa_trie
+
+from lru import LRUCache
+from resources import is_fresh
+
+
+def read_brown(path):
+    """
+    Reads a Brown cluster file (path, word, frequency per line) into a word -> path dictionary
+    """
+    return dict([(e[1].decode('utf8'), e[0]) for e in [e.split('\t') for e in open(path)]])
+
+
+def compile_brown(path, compiled_path):
+    """
+    Compiles a Brown cluster file into a marisa BytesTrie mapping words to their cluster paths
+    """
+    trie = marisa_trie.BytesTrie(read_brown(path).iteritems())
+    tmp_path = compiled_path + '.' + str(os.getpid())
+    trie.save(tmp_path)
+    os.rename(tmp_path, compiled_path)
+
+
+class BrownClusters(object):
+    '''Brown cluster paths looked up in a memory mapped marisa trie instead of a per-process dictionary'''
+
+    # Number of words whose prefix features are kept
+    FEATURE_CACHE_SIZE = 50000
+
+    def __init__(self, path):
+        '''
+        @param path: path of the Brown cluster file, the compiled trie is stored next to it
+        @type path: string
+        '''
+        compiled_path = path + '.marisa'
+        try:
+            if not is_fresh(compiled_path, path):
+                compile_brown(path, compiled_path)
+            self.trie = marisa_trie.BytesTrie()
+            self.trie.mmap(compiled_path)
+        except (IOError, OSError):
+            # The folder is not writable, build the trie in memory
+            self.trie = marisa_trie.BytesTrie(read_brown(path).iteritems())
+        self.feature_cache = LRUCache(BrownClusters.FEATURE_CACHE_SIZE)
+
+    def __contains__(self, word):
+        return word in self.trie
+
+    def __getitem__(self, word):
+        return self.trie[word][0]
+
+    def get(self, word, default=None):
+        if word in self.trie:
+            return self.trie[word][0]
+        return default
+
+    def prefix_features(self, word):
+        """
+        Returns the brown[2..n] prefix features of a word
+        """
+        features = self.feature_cache.get(word)
+        if features is None:
+            features = []
+            if word in self.trie:
+                path = self.trie[word][0]
+                for end in range(2, len(path) + 1, 2):
+                    features.append('brown[' + str(end) + ']=' + path[:end])
+            self.feature_cache.put(word, features)
+        return features
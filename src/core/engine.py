@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import os
+import gc
+import threading
+import multiprocessing
+from collections import deque
+
+from loading import load_models
+
+# The NER tagger of a worker process, set once by the pool initializer
+_worker_tagger = None
+
+# Held while a pool forks its workers, so the pools of several languages are never forked concurrently
+_fork_lock = threading.Lock()
+
+
+def _init_worker(lang):
+    global _worker_tagger
+    _worker_tagger = load_models(lang)['ner_tagger']
+
+
+def _init_preloaded_worker(ner_tagger):
+    # The tagger is an argument of the pool's initializer, so workers the pool respawns get the same one
+    global _worker_tagger
+    _worker_tagger = ner_tagger
+
+
+def _worker_stats():
+    # The counters of the worker's caches are sent back with every result, keyed by the worker
+    return os.getpid(), _worker_tagger.stats() if hasattr(_worker_tagger, 'stats') else {}
+
+
+def _tag_sentences(sentences):
+    return _worker_tagger.tag(sentences, vert=True), _worker_stats()
+
+
+def _tag_text(text):
+    return _worker_tagger.tag(text), _worker_stats()
+
+
+def _merge_stats(total, stats):
+    # Sums the counters of the same caches of several workers, the hit ratios are computed from the sums
+    for name, value in stats.items():
+        if isinstance(value, dict):
+            _merge_stats(total.setdefault(name, {}), value)
+        elif name != 'hit_ratio' and value is not None:
+            total[name] = total.get(name, 0) + value
+    if 'hit_ratio' in stats:
+        lookups = total['hits'] + total['misses']
+        total['hit_ratio'] = float(total['hits']) / lookups if lookups > 0 else 0.0
+    return total
+
+
+def _chunks(sentences, size):
+    chunk = []
+    for sentence in sentences:
+        chunk.append(sentence)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+class TaggingEngine(object):
+    '''Tags texts in a pool of worker processes, so tagging is not serialised by the GIL'''
+
+    # Number of sentences sent to a worker at once when a document is split
+    CHUNK_SENTENCES = 200
+
+    # Chunks of a streamed document submitted ahead of the one consumed, per worker process
+    WINDOW_CHUNKS = 2
+
+    def __init__(self, lang, segmenter, processes=None, chunk_sentences=CHUNK_SENTENCES, ner_tagger=None):
+        '''
+        @param lang: language of the models loaded by the workers
+        @type lang: string
+        @param segmenter: segmenter used to split documents at sentence boundaries
+        @type segmenter: Segmenter
+        @param processes: number of worker processes, defaults to the number of cores
+        @type processes: int
+        @param chunk_sentences: maximum number of sentences tagged by a single worker call
+        @type chunk_sentences: int
+        @param ner_tagger: preloaded NER tagger inherited by the forked workers instead of loading their own
+        @type ner_tagger: NerTagger
+        '''
+        self.lang = lang
+        self.segmenter = segmenter
+        self.chunk_sentences = chunk_sentences
+        self.window = TaggingEngine.WINDOW_CHUNKS * (processes or multiprocessing.cpu_count())
+        # Latest cache counters of every worker process by its pid
+        self.worker_stats = {}
+        with _fork_lock:
+            if ner_tagger is None:
+                self.pool = multiprocessing.Pool(processes, _init_worker, (lang,))
+            else:
+                # Workers are forked after the models are loaded and share their pages copy-on-write
+                gc.collect()
+                self.pool = multiprocessing.Pool(processes, _init_preloaded_worker, (ner_tagger,))
+
+    def tag(self, text, vert=False):
+        """
+        Tags a text, large texts are split at sentence boundaries across the workers and reassembled in order
+        """
+        sentences = text if vert else self.segmenter.segment(text)
+        if len(sentences) <= self.chunk_sentences:
+            return self._collect(self.pool.apply(_tag_sentences, (sentences,)))
+
+        chunks = [sentences[i:i + self.chunk_sentences] for i in range(0, len(sentences), self.chunk_sentences)]
+        result = []
+        for tagged in self.pool.imap(_tag_sentences, chunks):
+            result.extend(self._collect(tagged))
+        return result
+
+    def iter_tag(self, text, vert=False):
+        """
+        Lazily tags a text, chunks of sentences are tagged by the workers while earlier ones are consumed. The text
+        is segmented only as far as the window of submitted chunks reaches, so a bounded number of chunks is held.
+        """
+        sentences = text if vert else self.segmenter.iter_segment(text)
+        pending = deque()
+        for chunk in _chunks(sentences, self.chunk_sentences):
+            pending.append(self.pool.apply_async(_tag_sentences, (chunk,)))
+            if len(pending) >= self.window:
+                for sentence in self._collect(pending.popleft().get()):
+                    yield sentence
+
+        while pending:
+            for sentence in self._collect(pending.popleft().get()):
+                yield sentence
+
+    def tag_many(self, texts):
+        """
+        Tags a list of documents in parallel, returns a list of tagged documents in the same order
+        """
+        return [self._collect(tagged) for tagged in self.pool.map(_tag_text, texts)]
+
+    def _collect(self, tagged):
+        result, (pid, stats) = tagged
+        self.worker_stats[pid] = stats
+        return result
+
+    def stats(self):
+        """
+        Returns the cache counters of the workers summed over the workers which have tagged since they started.
+        Workers replaced by the pool keep their last counters.
+        """
+        stats = {'workers': len(self.worker_stats)}
+        for worker in self.worker_stats.values():
+            _merge_stats(stats, worker)
+        return stats
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
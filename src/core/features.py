@@ -0,0 +1,207 @@
+#!/usr/bin/python
+#-*-coding:utf8-*-
+
+import re
+
+def packed_shape(token,index):
+  packed=''
+  for char in token:
+    if char.isupper():
+      packed+='u'
+    elif char.islower():
+      packed+='l'
+    elif char.isdigit():
+      packed+='d'
+    else:
+      packed+='x'
+  if index==0:
+    packed+='_START'
+  return re.sub(r'(.)\1{2,}',r'\1\1',packed)
+
+def islcase(token):
+  return token.lower()==token
+
+def isnum(token):
+  return re.search(r'\d',token)!=None
+
+def transnum(token):
+  return re.sub(r'\d','D',token)
+
+def wpos(sent,index):
+  if index>=0 and index<len(sent):
+    return transnum(sent[index].lower())
+
+def wsuf(token,length):
+  if token==None:
+    return
+  if len(token)>length:
+    token=transnum(token.lower())
+    return token[-length:]
+
+def escape_colon(text):
+  return text.replace('\\','\\\\').replace(':','\\:')
+
+def token_features(token,trie=None,search=None):
+  """Features of a token which do not depend on its position in the sentence"""
+  suffixes=[]
+  for i in range(4):
+    suffix=wsuf(token,i+1)
+    if suffix!=None:
+      suffixes.append('s['+str(i+1)+']='+suffix)
+  msds=None
+  if trie!=None:
+    msds=search(token.lower(),trie)
+  # packed_shape(token,0) only differs by the appended _START
+  return (transnum(token.lower()),packed_shape(token,1),suffixes,msds)
+
+class SentenceFeatures(object):
+  """
+  Token features of a sentence which are shared by the MSD and the NER tagger,
+  computed once per sentence and consumed by both CRF stages
+  """
+
+  def __init__(self,tokens,trie=None,search=None,cache=None):
+    self.tokens=tokens
+    if cache==None:
+      self.static=[token_features(token,trie,search) for token in tokens]
+    else:
+      self.static=[]
+      for token in tokens:
+        feats=cache.get(token)
+        if feats==None:
+          feats=token_features(token,trie,search)
+          cache.put(token,feats)
+        self.static.append(feats)
+    self._base=None
+
+  def __len__(self):
+    return len(self.tokens)
+
+  def form(self,index):
+    return self.static[index][0]
+
+  def msds(self,index):
+    return self.static[index][3]
+
+  def base(self):
+    """Context features (forms, shape and suffixes) of every token, common to both taggers"""
+    if self._base==None:
+      static=self.static
+      length=len(static)
+      self._base=[]
+      for index in range(length):
+        form,shape,suffixes,msds=static[index]
+        tfeat=['w[0]='+form]
+        if index==0:
+          tfeat.append('packed_shape='+shape+'_START')
+        else:
+          tfeat.append('packed_shape='+shape)
+        for i in range(1,4): #w[-1] w[1]
+          if index-i>=0:
+            tfeat.append('w['+str(-i)+']='+static[index-i][0])
+          if index+i<length:
+            tfeat.append('w['+str(i)+']='+static[index+i][0])
+        tfeat.extend(suffixes)
+        self._base.append(tfeat)
+    return self._base
+
+def brown_features(brown,form):
+  """brown[2..n] prefix features of a word, precomputed by BrownClusters"""
+  if hasattr(brown,'prefix_features'):
+    return brown.prefix_features(form)
+  feats=[]
+  if form in brown:
+    path=brown[form]
+    for end in range(2,len(path)+1,2):
+      feats.append('brown['+str(end)+']='+path[:end])
+  return feats
+
+def sentence_end(index,length):
+  if index==0:
+    return ['__BOS__']
+  elif index+1==length:
+    return ['__EOS__']
+  return []
+
+def search_trie(token,trie,iscomplete=False):
+  token='_'+token
+  for i in range(len(token)):
+    if token[-len(token)+i:] in trie:
+      if iscomplete:
+        if i==0:
+          return (trie[token[-len(token)+i:]],True)
+        else:
+          return (trie[token[-len(token)+i:]],False)
+      return trie[token[-len(token)+i:]]
+
+def decode(s):  
+  return ''.join(s).strip('0')
+
+def reverse(s):
+  t=''
+  for u in s:
+    t=u+t
+  return t
+
+def search_marisa(token,trie,iscomplete=False):
+  token=reverse(u'_'+token)
+  if token in trie:
+    return [decode(e) for e in trie[token]]
+  else:
+    prefixes=trie.prefixes(token)
+    if len(prefixes)>0:
+      return [decode(e) for e in trie[sorted([(len(e),e) for e in prefixes],reverse=True)[0][1]]]
+
+def extract_features_msd(sent,trie,search=search_marisa,cache=None): #originally "combined2", relates to the model named "lexicon"
+  if not isinstance(sent,SentenceFeatures):
+    sent=SentenceFeatures(sent,trie,search,cache)
+  length=len(sent)
+  features=[]
+  for index,base in enumerate(sent.base()):
+    tfeat=list(base)
+    msds=sent.msds(index)
+    if msds!=None:
+      for msd in msds:
+        tfeat.append('msd='+msd)
+    for i in range(1,3):
+      if index-i>=0:
+        msds=sent.msds(index-i)
+        if msds!=None:
+          for msd in msds:
+            tfeat.append('msd[-'+str(i)+']='+msd)
+      if index+i<length:
+        msds=sent.msds(index+i)
+        if msds!=None:
+          for msd in msds:
+            tfeat.append('msd['+str(i)+']='+msd)
+    tfeat.extend(sentence_end(index,length))
+    features.append(tfeat)
+  return features
+
+def extract_features(tokens,tags,brown):
+  if not isinstance(tokens,SentenceFeatures):
+    tokens=SentenceFeatures(tokens)
+  length=len(tokens)
+  features=[]
+  for index,(base,tag) in enumerate(zip(tokens.base(),tags)):
+    tfeat=list(base)
+    tfeat.append('POS='+tag[:2])
+    tfeat.append('MSD='+tag)
+    tfeat.extend(brown_features(brown,tokens.form(index)))
+    tfeat.extend(sentence_end(index,length))
+    features.append(tfeat)
+  return features
+
+def suffix(token,n):
+  if len(token)>n:
+    return token[-n:]
+
+def extract_features_lemma(token):
+  features={}
+  for i in range(4):
+    suf=suffix(token,i+1)
+    if suf!=None:
+      features['suf'+str(i+1)]=suf
+  if len(token)>3:
+    features['pref3']=token[:3]
+  return features
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import cPickle as pickle
-from train_lemmatiser import extract_features_lemma
+from features import extract_features_lemma
 
 
 class Lematiser(object):
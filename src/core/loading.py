@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+import traceback
+
+import tokenizer
+from segmenter import Segmenter
+from tagger import Tagger
+from ner_tagger import NerTagger
+
+
+def timed(phases, name, build):
+    """
+    Calls build and records the seconds it took under name in phases
+    """
+    start = time.time()
+    result = build()
+    phases[name] = time.time() - start
+    return result
+
+
+def load_models(lang):
+    """
+    Loads the segmenter, tagger and NER tagger of a language. The resources of the three are read in parallel
+    threads and the components are linked once all of them are loaded. Returns the components by name and the
+    seconds spent in every loading phase under 'phases'.
+    """
+    phases = {}
+    components = {}
+    errors = []
+
+    def segmenter():
+        timed(phases, 'abbreviations', lambda: tokenizer.abbrev_order[lang])
+        return timed(phases, 'tokenizer', lambda: Segmenter(lang))
+
+    def tagger():
+        return timed(phases, 'tagger', lambda: Tagger(lang, None))
+
+    def ner_tagger():
+        return timed(phases, 'ner_tagger', lambda: NerTagger(lang, None))
+
+    def run(name, build):
+        try:
+            components[name] = build()
+        except Exception:
+            errors.append(traceback.format_exc())
+
+    start = time.time()
+    threads = [threading.Thread(target=run, args=(name, build), name='load-' + lang + '-' + name)
+               for name, build in (('segmenter', segmenter), ('tagger', tagger), ('ner_tagger', ner_tagger))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError('Loading the models of ' + lang + ' failed:\n' + '\n'.join(errors))
+
+    components['tagger'].segmenter = components['segmenter']
+    components['ner_tagger'].tagger = components['tagger']
+    phases['total'] = time.time() - start
+    components['phases'] = phases
+    return components
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    Bounded least recently used cache which counts its hits and misses. Besides the number of entries, the cache
+    can be bounded by the total size of its values, measured by the sizeof function. The cache is shared by request
+    and job threads, every operation holds its lock.
+    '''
+
+    def __init__(self, maxsize=100000, maxbytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key and marks it as recently used
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries when the cache is full
+        """
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.maxbytes is not None:
+                if size > self.maxbytes:
+                    # Would evict everything else
+                    return
+                self._sizes[key] = size
+                self.bytes += size
+
+            self._data[key] = value
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                oldest, _ = self._data.popitem(last=False)
+                self.bytes -= self._sizes.pop(oldest, 0)
+
+    def pop(self, key, default=None):
+        """
+        Removes a key, returns its value
+        """
+        with self._lock:
+            return self._pop(key, default)
+
+    def _pop(self, key, default=None):
+        self.bytes -= self._sizes.pop(key, 0)
+        return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        Returns the size and hit / miss counters of the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'bytes': self.bytes,
+                'maxbytes': self.maxbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': float(self.hits) / lookups if lookups > 0 else 0.0
+            }
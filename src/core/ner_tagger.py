@@ -2,7 +2,6 @@
 # -*-coding:utf8-*-
 
 import warnings
-from itertools import izip
 
 warnings.filterwarnings("ignore")
 
@@ -11,40 +10,77 @@ import os
 
 reldir = os.path.dirname(os.path.abspath(__file__))
 
-from train_ner_tagger import extract_features
-from subprocess import Popen, PIPE
-import cPickle as pickle
-from StringIO import StringIO
+from features import extract_features
+from brown import BrownClusters
+from lru import LRUCache
 import pycrfsuite
 
 
 class NerTagger(object):
     '''Class segmenter'''
 
+    # Number of distinct sentences whose named entity tags are cached and the memory they may take
+    SENTENCE_CACHE_SIZE = 50000
+    SENTENCE_CACHE_BYTES = 64 * 1024 * 1024
+
+    # Estimated memory of a cached sentence per token: the token and MSD in the key, its tag and the tuple slots
+    SENTENCE_TOKEN_BYTES = 150
+
+    @staticmethod
+    def model_paths(lang):
+        """
+        Returns the paths of the NER model and the Brown clusters of a language
+        """
+        return [os.path.join(reldir, lang + '.ner.model'), os.path.join(reldir, lang + '.brown')]
+
     def __init__(self, lang, tagger):
         self.tagger = tagger
         self.lang = lang
+        model_path, brown_path = NerTagger.model_paths(lang)
         self.ner_tagger = pycrfsuite.Tagger()
-        self.ner_tagger.open(os.path.join(reldir, lang + '.ner.model'))
-        self._brown = dict(
-            [(e[1].decode('utf8'), e[0]) for e in [e.split('\t') for e in open(os.path.join(reldir, lang + '.brown'))]])
+        self.ner_tagger.open(model_path)
+        self._brown = BrownClusters(brown_path)
+        # (tuple of tokens, tuple of MSDs) -> tuple of named entity tags
+        self.sentence_cache = LRUCache(NerTagger.SENTENCE_CACHE_SIZE, NerTagger.SENTENCE_CACHE_BYTES,
+                                       lambda ners: NerTagger.SENTENCE_TOKEN_BYTES * (len(ners) + 1))
 
     def tag_sent(self, tokens, tags):
         # print extract_features(tokens,tags,brown)
         return self.ner_tagger.tag(extract_features(tokens, tags, self._brown))
 
-    def tag(self, text):
-        tagged_sents = self.tagger.tag(text)
-
-        ner_tagged_sents=[]
-        for sent in tagged_sents:
-            tokens = [e[0][0] for e in sent]
-            tags = [e[1] for e in sent]
-
-            ners = self.tag_sent(tokens,tags)
-            ner_tagged_sents.append([(a[0], a[1], b) for a,b in izip(sent,ners)]) # append ners to the result tuples
-
-        return ner_tagged_sents
+    def iter_tag(self, text, vert=False):
+        """
+        Lazily tags a text, yields one tagged Sentence at a time
+        """
+        for sent, features in self.tagger.iter_tag_sentences(text, vert):
+            key = (tuple(sent.tokens), sent.msds)
+            ners = self.sentence_cache.get(key)
+            if ners is None:
+                # reuse the token features computed by the MSD tagger, unless its MSDs were cached
+                ners = tuple(self.tag_sent(features if features is not None else sent.tokens, sent.msds))
+                self.sentence_cache.put(key, ners)
+            sent.ners = ners
+            yield sent
+
+    def tag(self, text, vert=False):
+        return list(self.iter_tag(text, vert))
+
+    def tag_many(self, texts):
+        """
+        Tags a list of documents, returns a list of tagged documents in the same order
+        """
+        return [self.tag(text) for text in texts]
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the sentence caches
+        """
+        return {
+            'sentence_cache': {
+                'msd': self.tagger.sentence_cache.stats(),
+                'ner': self.sentence_cache.stats()
+            }
+        }
 
 
 
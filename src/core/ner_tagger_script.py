@@ -8,7 +8,8 @@ import sys
 import os
 reldir=os.path.dirname(os.path.abspath(__file__))
 
-from train_ner_tagger import extract_features
+from features import extract_features
+from brown import BrownClusters
 from subprocess import Popen, PIPE
 import cPickle as pickle
 from StringIO import StringIO
@@ -60,5 +61,5 @@ if __name__=='__main__':
   args=parser.parse_args()
   tagger=pycrfsuite.Tagger()
   tagger.open(os.path.join(reldir,args.lang+'.ner.model'))
-  brown=dict([(e[1].decode('utf8'),e[0]) for e in [e.split('\t') for e in open(os.path.join(reldir,args.lang+'.brown'))]])
+  brown=BrownClusters(os.path.join(reldir,args.lang+'.brown'))
   read_and_write(sys.stdin,args.index-1,args.msdindex-1,sys.stdout)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import cPickle as pickle
+import marisa_trie
+
+
+def is_fresh(compiled_path, source_path):
+    """
+    Checks whether a compiled resource exists and is newer than its source
+    """
+    return os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= os.path.getmtime(source_path)
+
+
+def load_marisa(path):
+    """
+    Loads a pickled marisa trie through marisa's mmap API, so the trie pages are shared by all processes
+    which map the same file. The native trie file (and a description of the trie type) is written next to
+    the pickle on first use and rebuilt whenever the pickle changes.
+    """
+    native_path = path + '.native'
+    meta_path = native_path + '.json'
+
+    if not is_fresh(native_path, path) or not is_fresh(meta_path, path):
+        trie = pickle.load(open(path, 'rb'))
+        cls, args = trie.__reduce__()[:2]
+        try:
+            # Write to temporary files first, workers may be compiling the same trie concurrently
+            suffix = '.' + str(os.getpid())
+            trie.save(native_path + suffix)
+            with open(meta_path + suffix, 'w') as f:
+                json.dump({'type': cls.__name__, 'args': list(args)}, f)
+            os.rename(native_path + suffix, native_path)
+            os.rename(meta_path + suffix, meta_path)
+        except (IOError, OSError):
+            # The assets folder is not writable, keep the unpickled trie
+            return trie
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    trie = getattr(marisa_trie, meta['type'])(*meta['args'])
+    trie.mmap(native_path)
+    return trie
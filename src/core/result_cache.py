@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import marshal
+import hashlib
+import sqlite3
+import threading
+
+from lru import LRUCache
+from sentence import Sentence
+
+
+class ResultCache(object):
+    '''
+    Cache of serialized tagging results with an in-memory LRU tier bounded by size and an optional
+    on-disk SQLite tier shared by all processes. One cache is shared by all languages.
+    '''
+
+    # Number of disk writes between two checks of the disk tier size
+    DISK_CHECK_WRITES = 100
+
+    def __init__(self, memory_bytes, disk_path=None, disk_bytes=None):
+        '''
+        @param memory_bytes: maximum size of the serialized results kept in memory
+        @type memory_bytes: int
+        @param disk_path: path of the disk tier database, no disk tier if None
+        @type disk_path: string
+        @param disk_bytes: maximum size of the serialized results kept on disk, unbounded if None
+        @type disk_bytes: int
+        '''
+        self.memory = LRUCache(maxsize=1000000, maxbytes=memory_bytes)
+        self.disk = None
+        if disk_path is not None:
+            # Imported here, the core modules are also used without the web application
+            from ..db.result_cache_db import ResultCacheDB
+            self.disk = ResultCacheDB(disk_path)
+        self.disk_bytes = disk_bytes
+        self.disk_hits = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the serialized result of a key, None if it is not cached
+        """
+        with self._lock:
+            value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+
+        rows = self.disk.query("SELECT value FROM results WHERE key = ?", (key,))
+        if len(rows) == 0:
+            return None
+
+        value = str(rows[0]['value'])
+        self.disk_hits += 1
+        with self._lock:
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key, version, value):
+        """
+        Stores the serialized result of a key in both tiers
+        """
+        with self._lock:
+            self.memory.put(key, value)
+        if self.disk is None:
+            return
+
+        self.disk.command("INSERT OR REPLACE INTO results (key, version, value, size, created) VALUES (?, ?, ?, ?, ?)",
+                          (key, version, sqlite3.Binary(value), len(value), time.time()))
+        self._writes += 1
+        if self.disk_bytes is not None and self._writes % ResultCache.DISK_CHECK_WRITES == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the oldest results from the disk tier until it fits its size limit
+        """
+        total = self.disk.query("SELECT COALESCE(SUM(size), 0) AS total FROM results")[0]['total']
+        if total <= self.disk_bytes:
+            return
+
+        excess = total - self.disk_bytes
+        freed = 0
+        keys = []
+        for row in self.disk.query("SELECT key, size FROM results ORDER BY created"):
+            if freed >= excess:
+                break
+            keys.append((row['key'],))
+            freed += row['size']
+        self.disk.commandMany("DELETE FROM results WHERE key = ?", keys)
+
+    def setVersion(self, lang, version):
+        """
+        Records the model version a language is loaded with, the results of the version it replaces are dropped
+        from the disk tier. The versions are stored with the results, so this also drops them after a restart.
+        """
+        if self.disk is None:
+            return
+
+        rows = self.disk.query("SELECT version FROM versions WHERE lang = ?", (lang,))
+        if len(rows) > 0 and rows[0]['version'] != version:
+            self.invalidate(rows[0]['version'])
+        self.disk.command("INSERT OR REPLACE INTO versions (lang, version) VALUES (?, ?)", (lang, version))
+
+    def invalidate(self, version):
+        """
+        Drops the results computed by a model version from the disk tier. Their keys contain the version, so
+        they are no longer looked up and leave the memory tier as it evicts.
+        """
+        if self.disk is not None:
+            self.disk.command("DELETE FROM results WHERE version = ?", (version,))
+
+    def stats(self):
+        """
+        Returns the hit and miss counters and the size of both tiers
+        """
+        with self._lock:
+            memory = self.memory.stats()
+        stats = {
+            'memory': memory,
+            'disk_hits': self.disk_hits,
+            'misses': memory['misses'] - self.disk_hits
+        }
+        if self.disk is not None:
+            row = self.disk.query("SELECT COUNT(*) AS size, COALESCE(SUM(size), 0) AS bytes FROM results")[0]
+            stats['disk'] = {'size': row['size'], 'bytes': row['bytes'], 'maxbytes': self.disk_bytes}
+
+        return stats
+
+
+class CachingTagger(object):
+    '''
+    Wraps a NER tagger (or a tagging engine) and returns cached results for texts which have already been tagged.
+    Results are keyed by a hash of the language, the text and the version of the files the loaded models were
+    read from. The version is taken when the models are loaded, results of models loaded from changed files are
+    stored under a new version once the models are reloaded.
+    '''
+
+    # Version of the serialized results, part of the model version so older results are not read
+    RESULT_FORMAT = 'sentence-columns'
+
+    def __init__(self, tagger, lang, version, cache):
+        '''
+        @param tagger: tagger of the language, with tag, iter_tag and tag_many
+        @type tagger: NerTagger
+        @param lang: language of the tagger
+        @type lang: string
+        @param version: version of the files the models of the tagger were loaded from, see modelVersion
+        @type version: string
+        @param cache: cache of the results
+        @type cache: ResultCache
+        '''
+        self.tagger = tagger
+        self.lang = lang
+        self.version = version
+        self.cache = cache
+
+    @staticmethod
+    def modelVersion(model_paths):
+        """
+        Returns the version of the files the results depend on, taken before the models are read from them
+        """
+        fingerprint = [CachingTagger.RESULT_FORMAT]
+        for path in model_paths:
+            try:
+                stat = os.stat(path)
+                fingerprint.append('{0}:{1}:{2}'.format(path, stat.st_size, stat.st_mtime))
+            except OSError:
+                fingerprint.append(path + ':missing')
+        return hashlib.sha1('\n'.join(fingerprint)).hexdigest()
+
+    def key(self, text):
+        """
+        Returns the cache key of a text
+        """
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        return hashlib.sha1(self.lang + '\0' + self.version + '\0' + text).hexdigest()
+
+    def _get(self, key):
+        value = self.cache.get(key)
+        return [Sentence.unpack(e) for e in marshal.loads(value)] if value is not None else None
+
+    def _put(self, key, result):
+        self.cache.put(key, self.version, marshal.dumps([sentence.pack() for sentence in result], 2))
+
+    def tag(self, text, vert=False):
+        # Pre-segmented sentences (vert) are not cached
+        if vert:
+            return self.tagger.tag(text, vert)
+
+        key = self.key(text)
+        result = self._get(key)
+        if result is None:
+            result = self.tagger.tag(text)
+            self._put(key, result)
+        return result
+
+    def iter_tag(self, text, vert=False):
+        """
+        Lazily tags a text, the result is cached once all of its sentences have been consumed. Results larger than
+        the memory tier are not cached, their sentences are dropped once they are consumed.
+        """
+        if vert:
+            for sentence in self.tagger.iter_tag(text, vert):
+                yield sentence
+            return
+
+        key = self.key(text)
+        result = self._get(key)
+        if result is not None:
+            for sentence in result:
+                yield sentence
+            return
+
+        packed = []
+        size = 0
+        for sentence in self.tagger.iter_tag(text):
+            if packed is not None:
+                packed.append(sentence.pack())
+                size += len(marshal.dumps(packed[-1], 2))
+                if size > self.cache.memory.maxbytes:
+                    packed = None
+            yield sentence
+        if packed is not None:
+            self.cache.put(key, self.version, marshal.dumps(packed, 2))
+
+    def tag_many(self, texts):
+        """
+        Tags a list of documents, only the documents which are not cached are passed to the tagger
+        """
+        keys = [self.key(text) for text in texts]
+        results = [self._get(key) for key in keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+        if missing:
+            for idx, result in zip(missing, self.tagger.tag_many([texts[idx] for idx in missing])):
+                results[idx] = result
+                self._put(keys[idx], result)
+        return results
+
+    def close(self):
+        if hasattr(self.tagger, 'close'):
+            self.tagger.close()
+
+    def stats(self):
+        stats = {}
+        if hasattr(self.tagger, 'stats'):
+            stats.update(self.tagger.stats())
+        stats['result_cache'] = self.cache.stats()
+        stats['result_cache']['version'] = self.version
+        return stats
@@ -2,12 +2,20 @@
 import os
 import sys
 # sys.path.append('./lib')
-from tokenizer import generate_tokenizer, tokenize, sentence_split, sentence_split_nonstd, spaces_re
+import tokenizer
+from tokenizer import generate_tokenizer, tokenize, iter_tokenize, sentence_split, sentence_split_nonstd, iter_sentence_split, spaces_re
 
 
 class Segmenter(object, ):
     '''Class segmenter'''
 
+    @staticmethod
+    def model_paths(lang):
+        """
+        Returns the paths of the abbreviations of a language and of the tokenizer rules
+        """
+        return [os.path.realpath(tokenizer.abbrev_files[lang]), os.path.splitext(tokenizer.__file__)[0] + '.py']
+
     def __init__(self, lang):
         self.lang = lang
         self.tokenizer = generate_tokenizer(lang)
@@ -18,3 +26,10 @@ class Segmenter(object, ):
         """
 
         return sentence_split(tokenize(self.tokenizer, u'' + sentence), self.lang)
+
+    def iter_segment(self, sentence):
+        """
+        Lazily segments a text into sentences of tokens, holding one sentence at a time
+        """
+
+        return iter_sentence_split(iter_tokenize(self.tokenizer, u'' + sentence), self.lang)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+
+class Sentence(object):
+    '''
+    Tokens of a sentence stored as columns: the token strings, their start and end offsets as integer arrays and
+    the MSD and named entity columns, which are filled in by the taggers. Indexing and iterating return the tuples
+    of the earlier representation, ((token, start, end), msd, ner), built on demand for the columns which are set.
+    '''
+
+    __slots__ = ('tokens', 'starts', 'ends', 'msds', 'ners')
+
+    def __init__(self, tokens, starts, ends, msds=None, ners=None):
+        '''
+        @param tokens: token strings
+        @type tokens: list
+        @param starts: start offsets of the tokens
+        @type starts: array
+        @param ends: end offsets of the tokens
+        @type ends: array
+        @param msds: MSD of every token, None until the sentence is tagged
+        @type msds: tuple
+        @param ners: named entity of every token, None until the sentence is tagged
+        @type ners: tuple
+        '''
+        self.tokens = tokens
+        self.starts = starts
+        self.ends = ends
+        self.msds = msds
+        self.ners = ners
+
+    @staticmethod
+    def fromTokens(tokens, offset=0):
+        """
+        Builds a sentence from (token, start, end) tuples, offset is added to the start offsets
+        """
+        return Sentence([e[0] for e in tokens], array('i', [e[1] + offset for e in tokens]),
+                        array('i', [e[2] for e in tokens]))
+
+    @staticmethod
+    def fromRows(rows):
+        """
+        Builds a sentence from flat rows, [token, start, end] followed by the MSD and the named entity if tagged
+        """
+        width = len(rows[0]) if len(rows) > 0 else 3
+        return Sentence([e[0] for e in rows], array('i', [e[1] for e in rows]), array('i', [e[2] for e in rows]),
+                        tuple([e[3] for e in rows]) if width > 3 else None,
+                        tuple([e[4] for e in rows]) if width > 4 else None)
+
+    def rows(self):
+        """
+        Returns the tokens as flat rows, the inverse of fromRows
+        """
+        columns = [e for e in (self.msds, self.ners) if e is not None]
+        return [list(row) for row in zip(self.tokens, self.starts, self.ends, *columns)]
+
+    def column(self, index):
+        """
+        Returns the column at a position of the tuples of a token, 0 for the token strings
+        """
+        column = (self.tokens, self.msds, self.ners)[index]
+        if column is None:
+            if len(self.tokens) == 0:
+                return ()
+            raise IndexError('The sentence has no column ' + str(index))
+        return column
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, index):
+        token = ((self.tokens[index], self.starts[index], self.ends[index]),)
+        if self.msds is None:
+            return token
+        if self.ners is None:
+            return token + (self.msds[index],)
+        return token + (self.msds[index], self.ners[index])
+
+    def __iter__(self):
+        for index in xrange(len(self.tokens)):
+            yield self[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Sentence(' + repr(list(self)) + ')'
+
+    def pack(self):
+        """
+        Returns the columns as a tuple of strings and lists, which can be marshalled
+        """
+        return (self.tokens, self.starts.tostring(), self.ends.tostring(), self.msds, self.ners)
+
+    @staticmethod
+    def unpack(packed):
+        """
+        Builds a sentence from the columns returned by pack
+        """
+        tokens, starts, ends, msds, ners = packed
+        sentence = Sentence(tokens, array('i'), array('i'), msds, ners)
+        sentence.starts.fromstring(starts)
+        sentence.ends.fromstring(ends)
+        return sentence
+
+    def __getstate__(self):
+        return self.pack()
+
+    def __setstate__(self, state):
+        sentence = Sentence.unpack(state)
+        for name in Sentence.__slots__:
+            setattr(self, name, getattr(sentence, name))
@@ -2,29 +2,67 @@
 import os
 import sys
 import pycrfsuite 
-import cPickle as pickle
-from train_tagger import extract_features_msd
+from features import extract_features_msd, search_marisa, SentenceFeatures
+from lru import LRUCache
+from sentence import Sentence
+from resources import load_marisa
 
 from tokenizer import spaces_re
 
 class Tagger(object,):
     '''Class segmenter'''
 
+    # Number of distinct surface forms whose static features are cached
+    TOKEN_CACHE_SIZE = 100000
+
+    # Number of distinct sentences whose MSDs are cached and the memory they may take
+    SENTENCE_CACHE_SIZE = 50000
+    SENTENCE_CACHE_BYTES = 64 * 1024 * 1024
+
+    # Estimated memory of a cached sentence per token: the token string in the key, its MSD and both tuple slots
+    SENTENCE_TOKEN_BYTES = 150
+
+    @staticmethod
+    def model_paths(lang):
+        """
+        Returns the paths of the MSD model and the lexicon of a language
+        """
+        return ['assets/' + lang + '.msd.model', 'assets/' + lang + '.marisa']
+
     def __init__(self, lang, segmenter):
         self.lang = lang
+        model_path, lexicon_path = Tagger.model_paths(lang)
         self.model = pycrfsuite.Tagger()
-        self.model.open('assets/' + lang + '.msd.model')
-        self.marisaTrie = pickle.load(open('assets/' + lang + '.marisa'))
+        self.model.open(model_path)
+        self.marisaTrie = load_marisa(lexicon_path)
         self.segmenter = segmenter
+        self.feature_cache = LRUCache(Tagger.TOKEN_CACHE_SIZE)
+        # tuple of tokens -> tuple of MSDs, repeated sentences skip feature extraction and the CRF
+        self.sentence_cache = LRUCache(Tagger.SENTENCE_CACHE_SIZE, Tagger.SENTENCE_CACHE_BYTES,
+                                       lambda msds: Tagger.SENTENCE_TOKEN_BYTES * (len(msds) + 1))
 
-    def tag(self, sentence, vert=False):
-        output=[]
+    def iter_tag_sentences(self, sentence, vert=False):
+        """
+        Lazily tags a text, yields (Sentence, SentenceFeatures) pairs so later stages can reuse the token features.
+        The MSDs are set on the sentence, the features are None for sentences whose MSDs come from the sentence cache.
+        """
         if not vert:
-            sentence = self.segmenter.segment(sentence)
+            sentence = self.segmenter.iter_segment(sentence)
 
         for sent in sentence:
-            sent = [(e[0], e[1] + 1, e[2]) for e in sent if spaces_re.search(e[0]) == None]
-            tokens = [e[0] for e in sent]
-            output.append([(a, b) for a, b in zip(sent, self.model.tag(extract_features_msd(tokens, self.marisaTrie)))])
-        return output
+            sent = Sentence.fromTokens([e for e in sent if spaces_re.search(e[0]) == None], 1)
+            key = tuple(sent.tokens)
+            msds = self.sentence_cache.get(key)
+            features = None
+            if msds is None:
+                features = SentenceFeatures(sent.tokens, self.marisaTrie, search_marisa, self.feature_cache)
+                msds = tuple(self.model.tag(extract_features_msd(features, self.marisaTrie)))
+                self.sentence_cache.put(key, msds)
+            sent.msds = msds
+            yield (sent, features)
+
+    def tag_sentences(self, sentence, vert=False):
+        return list(self.iter_tag_sentences(sentence, vert))
 
+    def tag(self, sentence, vert=False):
+        return [tagged for tagged, features in self.iter_tag_sentences(sentence, vert)]
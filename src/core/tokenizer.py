@@ -4,9 +4,10 @@ import re
 import codecs
 import sys
 import os
+import marshal
+import tempfile
 
-from signal import signal, SIGPIPE, SIG_DFL
-signal(SIGPIPE,SIG_DFL) 
+from resources import is_fresh
 
 def read_abbrevs(file):
   abbrevs={'B':[],'N':[],'S':[]}
@@ -16,19 +17,50 @@ def read_abbrevs(file):
       abbrevs[type].append(abbrev)
   return abbrevs
 
-abbrevs={
-  'hr':read_abbrevs(os.path.realpath('assets/hr.abbrev')),
-  'sr':read_abbrevs(os.path.realpath('assets/hr.abbrev')),
-  'sl':read_abbrevs(os.path.realpath('assets/sl.abbrev'))
+abbrev_files={
+  'hr':'assets/hr.abbrev',
+  'sr':'assets/hr.abbrev',
+  'sl':'assets/sl.abbrev'
 }
 
+def load_abbrevs(lang):
+  """Loads the abbreviations of a language into abbrev_order and abbrevs. The parsed lists are cached next to the
+  abbreviation file and reread whenever the file changes."""
+  path=os.path.realpath(abbrev_files[lang])
+  compiled_path=path+'.compiled'
+  if is_fresh(compiled_path,path):
+    lists=marshal.load(open(compiled_path,'rb'))
+  else:
+    lists=read_abbrevs(path)
+    try:
+      #written to a temporary file first, other processes and threads (hr and sr share a file) may be compiling it
+      fd,tmp_path=tempfile.mkstemp(prefix=os.path.basename(compiled_path)+'.',dir=os.path.dirname(compiled_path))
+      with os.fdopen(fd,'wb') as f:
+        marshal.dump(lists,f)
+      os.rename(tmp_path,compiled_path)
+    except (IOError,OSError):
+      pass
+  abbrev_order[lang]=lists['B']+lists['N']+lists['S']
+  #sets for lookup during sentence splitting
+  abbrevs[lang]=dict([(type,set([e.replace('\\.','.') for e in lists[type]])) for type in lists])
+
+class Abbrevs(dict):
+  """Abbreviations by language, loaded on first use"""
+  def __missing__(self,lang):
+    load_abbrevs(lang)
+    return dict.__getitem__(self,lang)
+
+#abbreviations in the order they are tried by the tokenizer
+abbrev_order=Abbrevs()
+#abbreviation sets by type (B, N and S)
+abbrevs=Abbrevs()
+
 num=r'(?:(?<!\d)[+-])?\d+(?:[.,:/]\d+)*(?:[.](?!\.)|-[^\W\d_]+)?'
 emoticon=r'[=:;8][\'-]*(?:\s?\)+|\s?\(+|\s?\]+|\s?\[+|\sd\b|\sp\b|d+\b|p+\b|s+\b|o+\b|/|\\|\$|\*+)|-\.-|\^_\^|\([\W]+\)|<3|</3|<\\3|\\o/'
 word=ur'(?:[*]{2,})?\w+(?:[@­\'-]\w+|[*]+\w+)*(?:[*]{2,})?'
 
 langs={
   'hr':{
-    'abbrev':ur'|'.join(abbrevs['hr']['B']+abbrevs['hr']['N']+abbrevs['hr']['S']),
     'num':num,
     'url':r'https?://[-\w/%]+(?:[.#?=&@;][-\w/%]+)+|\b\w+\.(?:\w+\.)?(?:si|hr|com|org|rs|ba|gl|me)/?\b',
     'htmlesc':r'&#?[a-z0-9]+;',
@@ -46,7 +78,6 @@ langs={
   },
 
   'sr':{
-    'abbrev':ur'|'.join(abbrevs['sr']['B']+abbrevs['sr']['N']+abbrevs['sr']['S']),
     'num':num,
     'url':r'https?://[-\w/%]+(?:[.#?=&@;][-\w/%]+)+|\b\w+\.(?:\w+\.)?(?:si|hr|com|org|rs|ba|gl|me)/?\b',
     'htmlesc':r'&#?[a-z0-9]+;',
@@ -64,7 +95,6 @@ langs={
   },
 
   'sl':{
-    'abbrev':ur'|'.join(abbrevs['sl']['B']+abbrevs['sl']['N']+abbrevs['sl']['S']),
     'num':num,
     'url':r'https?://[-\w/%]+(?:[.#?=&@;][-\w/%]+)+|\b\w+\.(?:\w+\.)?(?:si|hr|com|org|rs|ba|gl|me)/?\b',
     'htmlesc':r'&#?[a-z0-9]+;',
@@ -82,73 +112,303 @@ langs={
   }
 }
 
-#transform abbreviation lists to sets for lookup during sentence splitting
-for lang in abbrevs:
-  for type in abbrevs[lang]:
-    abbrevs[lang][type]=set([e.replace('\\.','.') for e in abbrevs[lang][type]])
-
 spaces_re=re.compile(r'\s+',re.UNICODE)
 
+def abbrev_literal(pattern):
+  """Returns the text matched by an abbreviation pattern, None if the pattern is not a plain escaped literal"""
+  literal=[]
+  index=0
+  while index<len(pattern):
+    char=pattern[index]
+    if char=='\\':
+      if index+1==len(pattern) or pattern[index+1].isalnum():
+        return None
+      char=pattern[index+1]
+      index+=1
+    elif char in '.^$*+?{}[]|()':
+      return None
+    literal.append(char)
+    index+=1
+  return ''.join(literal)
+
+def abbrev_trie(literals):
+  """Builds a trie of the lowercased abbreviations which can be matched by an ordered alternation.
+  An abbreviation preceded by one of its prefixes never matches, as the prefix is tried first.
+  Of the remaining abbreviations the alternation always matches the longest one."""
+  trie={}
+  for literal in literals:
+    node=trie
+    for char in literal.lower():
+      if '' in node:
+        break
+      node=node.setdefault(char,{})
+    else:
+      node['']=True
+  return trie
+
+def trie_regex(node):
+  """Compiles a trie into a regular expression matching its longest entry, deeper branches are tried first"""
+  alternatives=[re.escape(char)+trie_regex(child) for char,child in sorted(node.items()) if char!='']
+  if len(alternatives)==0:
+    return ''
+  if '' in node:
+    return '(?:'+'|'.join(alternatives)+')?'
+  if len(alternatives)==1:
+    return alternatives[0]
+  return '(?:'+'|'.join(alternatives)+')'
+
 def generate_tokenizer(lang):
-  els=langs[lang]
-  token_re=re.compile(r'|'.join([langs[lang][e] for e in langs[lang]['order']]),re.UNICODE|re.IGNORECASE)
+  """Compiles the tokenizer of a language, matching the same tokens as reference_tokenizer. If the abbreviations are
+  literals they are matched through a trie regex instead of being tried one by one at every position, and spaces,
+  which no other alternative then starts with, are tried first."""
+  alternatives=dict(langs[lang])
+  alternatives['abbrev']=ur'|'.join(abbrev_order[lang])
+  order=list(langs[lang]['order'])
+  literals=[abbrev_literal(e) for e in abbrev_order[lang]]
+  if len(literals)>0 and None not in literals and '' not in literals:
+    alternatives['abbrev']=trie_regex(abbrev_trie(literals))
+    if not [e for e in literals if e[0].isspace()]:
+      order.remove('space')
+      order.insert(0,'space')
+  return re.compile(r'|'.join([alternatives[e] for e in order]),re.UNICODE|re.IGNORECASE)
+
+def reference_tokenizer(lang):
+  """Compiles the tokenizer as a plain alternation of every abbreviation and token class, in the order of the language"""
+  alternatives=dict(langs[lang])
+  alternatives['abbrev']=ur'|'.join(abbrev_order[lang])
+  token_re=re.compile(r'|'.join([alternatives[e] for e in langs[lang]['order']]),re.UNICODE|re.IGNORECASE)
   return token_re
 
 def tokenize(tokenizer,paragraph):
   return [(e.group(0),e.start(0),e.end(0)) for e in tokenizer.finditer(paragraph.strip())]#spaces_re.sub(' ',paragraph.strip()))]
 
-def sentence_split_nonstd(tokens,lang):
+def iter_tokenize(tokenizer,paragraph):
+  for e in tokenizer.finditer(paragraph.strip()):
+    yield (e.group(0),e.start(0),e.end(0))
+
+def is_boundary_nonstd(tokens,index,lang):
+  token=tokens[index][0]
+  if token[0] in u'.!?…': #if sentence ending punctuation
+    return True
+  elif token.endswith('.'): #if abbreviation
+    if token.lower() not in abbrevs[lang]['N']: #if not in non-splitting abbreviations
+      if token.lower() in abbrevs[lang]['S']: #if in splitting abbreviations
+        return True
+      elif len(token)>2:
+        if tokens[index+1][0][0].isupper(): #else if next is uppercase
+          return True
+        if index+2<len(tokens): # else if next is space and nextnext is uppercase
+          if tokens[index+1][0][0].isspace() and tokens[index+2][0][0].isupper():
+          #tokens[index+1][0][0] not in u'.!?…':
+            return True
+  return False
+
+def is_boundary(tokens,index,lang):
+  token=tokens[index][0]
+  if token[0] in u'.!?…' or (token.endswith('.') and token.lower() not in abbrevs[lang]['N'] and len(token)>2 and tokens[index+1][0][0] not in u'.!?…'):
+    if tokens[index+1][0][0].isupper():
+      return True
+    if index+2<len(tokens):
+      if tokens[index+2][0][0].isupper():
+        if tokens[index+1][0].isspace() or tokens[index+1][0][0] in u'-»"\'':
+          return True
+    if index+3<len(tokens):
+      if tokens[index+3][0][0].isupper():
+        if tokens[index+1][0].isspace() and tokens[index+2][0][0] in u'-»"\'':
+          return True
+    if index+4<len(tokens):
+      if tokens[index+4][0][0].isupper():
+        if tokens[index+1][0].isspace() and tokens[index+2][0][0] in u'-»"\'' and tokens[index+3][0][0] in u'-»"\'':
+          return True
+  return False
+
+#NumPy, imported by the first vectorised split as it is slow to import, False if it is not installed
+numpy=None
+
+def load_numpy():
+  """Imports NumPy on first use, returns whether it is installed"""
+  global numpy
+  if numpy is None:
+    try:
+      import numpy
+    except ImportError:
+      numpy=False
+  return numpy is not False
+
+#code points of the sentence ending punctuation and the quotes the boundary rules look for
+TERMINAL_CODES=[ord(c) for c in u'.!?…']
+QUOTE_CODES=[ord(c) for c in u'-»"\'']
+
+def shifted(array,offset):
+  """Returns the values offset tokens ahead, False past the end"""
+  result=numpy.zeros(len(array),dtype=bool)
+  result[:max(len(array)-offset,0)]=array[offset:]
+  return result
+
+def code_points(chars):
+  """Returns the code points of a list of characters as an array"""
+  return numpy.frombuffer(u''.join(chars).encode('utf-32-le'),dtype='<u4')
+
+#whether each character of the basic multilingual plane is uppercase and is a space, built on first use
+char_classes=None
+
+def classify(codes,tokens):
+  """Returns whether the first characters of tokens, given by their code points, are uppercase and spaces"""
+  global char_classes
+  if char_classes is None:
+    chars=[unichr(c) for c in range(0x10000)]
+    char_classes=(numpy.array([c.isupper() for c in chars],dtype=bool),numpy.array([c.isspace() for c in chars],dtype=bool))
+  upper=char_classes[0][numpy.minimum(codes,0xffff)]
+  space=char_classes[1][numpy.minimum(codes,0xffff)]
+  for index in numpy.flatnonzero(codes>0xffff).tolist():
+    upper[index]=tokens[index][0][0].isupper()
+    space[index]=tokens[index][0][0].isspace()
+  return upper,space
+
+def boundary_features(tokens,lang,lookahead):
+  """Computes the features of the vectorised boundary rules. The classes of the first characters of all tokens are
+  computed in bulk from their code points, abbreviations are only looked up for tokens ending with a dot and whole
+  tokens are only checked for spaces up to lookahead after a token which could end a sentence."""
+  load_numpy()
+  firsts=code_points([e[0][0] for e in tokens])
+  terminal=numpy.in1d(firsts,TERMINAL_CODES)
+  quote=numpy.in1d(firsts,QUOTE_CODES)
+  upper,first_space=classify(firsts,tokens)
+  abbrev=numpy.zeros(len(tokens),dtype=bool)
+  splitting=numpy.zeros(len(tokens),dtype=bool)
+  long=numpy.zeros(len(tokens),dtype=bool)
+  for index in numpy.flatnonzero(code_points([e[0][-1] for e in tokens])==ord('.')).tolist():
+    token=tokens[index][0]
+    lowered=token.lower()
+    abbrev[index]=lowered not in abbrevs[lang]['N']
+    splitting[index]=lowered in abbrevs[lang]['S']
+    long[index]=len(token)>2
+  following=numpy.zeros(len(tokens),dtype=bool)
+  candidate=terminal|abbrev
+  for offset in range(1,lookahead+1):
+    following[offset:]|=candidate[:max(len(tokens)-offset,0)]
+  space=numpy.zeros(len(tokens),dtype=bool)
+  for index in numpy.flatnonzero(following&first_space).tolist():
+    space[index]=tokens[index][0].isspace()
+  return terminal,quote,abbrev,splitting,long,upper,space,first_space
+
+def boundary_marks(tokens,lang):
+  """Vectorised is_boundary, returns an array which is True at every token ending a sentence"""
+  terminal,quote,abbrev,splitting,long,upper,space,first_space=boundary_features(tokens,lang,4)
+  space1=shifted(space,1)
+  quote2=shifted(quote,2)
+  marks=(terminal|(abbrev&long&~shifted(terminal,1)))&(shifted(upper,1)|
+    (shifted(upper,2)&(space1|shifted(quote,1)))|
+    (shifted(upper,3)&space1&quote2)|
+    (shifted(upper,4)&space1&quote2&shifted(quote,3)))
+  #the last token never ends a sentence by itself
+  marks[-1:]=False
+  return marks
+
+def boundary_marks_nonstd(tokens,lang):
+  """Vectorised is_boundary_nonstd, returns an array which is True at every token ending a sentence"""
+  terminal,quote,abbrev,splitting,long,upper,space,first_space=boundary_features(tokens,lang,2)
+  marks=terminal|(abbrev&(splitting|(long&(shifted(upper,1)|(shifted(first_space,1)&shifted(upper,2))))))
+  marks[-1:]=False
+  return marks
+
+#vectorised versions of the boundary rules
+vectorised={is_boundary:boundary_marks,is_boundary_nonstd:boundary_marks_nonstd}
+
+#number of tokens below which the per call cost of the vectorised rules exceeds their gain
+VECTORISED_MIN_TOKENS=512
+
+def split_at(tokens,lang,boundary):
   boundaries=[0]
   for index in range(len(tokens)-1):
-    token=tokens[index][0]
-    if token[0] in u'.!?…': #if sentence ending punctuation
+    if boundary(tokens,index,lang):
       boundaries.append(index+1)
-    elif token.endswith('.'): #if abbreviation
-      if token.lower() not in abbrevs[lang]['N']: #if not in non-splitting abbreviations
-        if token.lower() in abbrevs[lang]['S']: #if in splitting abbreviations
-          boundaries.append(index+1)
-        elif len(token)>2:
-          if tokens[index+1][0][0].isupper(): #else if next is uppercase
-            boundaries.append(index+1)
-            continue
-          if index+2<len(tokens): # else if next is space and nextnext is uppercase
-            if tokens[index+1][0][0].isspace() and tokens[index+2][0][0].isupper():
-            #tokens[index+1][0][0] not in u'.!?…':
-              boundaries.append(index+1)
   boundaries.append(len(tokens))
   sents=[]
   for index in range(len(boundaries)-1):
     sents.append(tokens[boundaries[index]:boundaries[index+1]])
   return sents
 
+def split_marks(tokens,lang,boundary):
+  """Splits tokens into sentences like split_at, computing the boundaries with the vectorised boundary rule"""
+  load_numpy()
+  boundaries=[0]+[index+1 for index in numpy.flatnonzero(vectorised[boundary](tokens,lang)).tolist()]+[len(tokens)]
+  return [tokens[boundaries[index]:boundaries[index+1]] for index in range(len(boundaries)-1)]
+
+def split(tokens,lang,boundary):
+  """Splits tokens into sentences, vectorised if NumPy is installed and there are enough tokens to pay off"""
+  if len(tokens)>=VECTORISED_MIN_TOKENS and load_numpy():
+    return split_marks(tokens,lang,boundary)
+  return split_at(tokens,lang,boundary)
+
+def sentence_split_nonstd(tokens,lang):
+  return split(tokens,lang,is_boundary_nonstd)
+
 def sentence_split(tokens,lang):
-  boundaries=[0]
-  for index in range(len(tokens)-1):
-    token=tokens[index][0]
-    if token[0] in u'.!?…' or (token.endswith('.') and token.lower() not in abbrevs[lang]['N'] and len(token)>2 and tokens[index+1][0][0] not in u'.!?…'):
-      if tokens[index+1][0][0].isupper():
-        boundaries.append(index+1)
-        continue
-      if index+2<len(tokens):
-        if tokens[index+2][0][0].isupper():
-          if tokens[index+1][0].isspace() or tokens[index+1][0][0] in u'-»"\'':
-            boundaries.append(index+1)
-            continue
-      if index+3<len(tokens):
-        if tokens[index+3][0][0].isupper():
-          if tokens[index+1][0].isspace() and tokens[index+2][0][0] in u'-»"\'':
-            boundaries.append(index+1)
-            continue
-      if index+4<len(tokens):
-        if tokens[index+4][0][0].isupper():
-          if tokens[index+1][0].isspace() and tokens[index+2][0][0] in u'-»"\'' and tokens[index+3][0][0] in u'-»"\'':
-            boundaries.append(index+1)
-            continue
-  boundaries.append(len(tokens))
-  sents=[]
-  for index in range(len(boundaries)-1):
-    sents.append(tokens[boundaries[index]:boundaries[index+1]])
-  return sents
+  return split(tokens,lang,is_boundary)
+
+#number of following tokens a boundary decision may look at
+LOOKAHEAD=4
+
+#number of streamed tokens whose boundaries are computed at once by a vectorised boundary rule
+SPLIT_CHUNK=1000
+
+def iter_split_at(tokens,lang,boundary):
+  """Splits a stream of tokens into sentences, holding at most one sentence and the lookahead in memory"""
+  window=[]
+  sent=[]
+  for token in tokens:
+    window.append(token)
+    if len(window)>LOOKAHEAD:
+      sent.append(window[0])
+      if boundary(window,0,lang):
+        yield sent
+        sent=[]
+      del window[0]
+  #the lookahead at the end of the stream, the last token never ends a sentence by itself
+  for index in range(len(window)):
+    sent.append(window[index])
+    if index<len(window)-1 and boundary(window,index,lang):
+      yield sent
+      sent=[]
+  yield sent
+
+def iter_split_marks(tokens,lang,boundary):
+  """Splits a stream of tokens into sentences like iter_split_at, computing the boundaries of a chunk of tokens at
+  once with the vectorised boundary rule. Holds at most one sentence, a chunk and the lookahead in memory."""
+  load_numpy()
+  buffer=[]
+  #boundaries of the buffered tokens before it have been decided
+  checked=0
+  for token in tokens:
+    buffer.append(token)
+    if len(buffer)-checked>=SPLIT_CHUNK+LOOKAHEAD:
+      decided=len(buffer)-LOOKAHEAD
+      start=0
+      for index in numpy.flatnonzero(vectorised[boundary](buffer[checked:],lang)[:decided-checked]).tolist():
+        yield buffer[start:checked+index+1]
+        start=checked+index+1
+      del buffer[:start]
+      checked=decided-start
+  #the end of the stream, the last token never ends a sentence by itself
+  if len(buffer)-checked>=VECTORISED_MIN_TOKENS:
+    ends=[checked+index for index in numpy.flatnonzero(vectorised[boundary](buffer[checked:],lang)).tolist()]
+  else:
+    ends=[index for index in range(checked,len(buffer)-1) if boundary(buffer,index,lang)]
+  start=0
+  for index in ends:
+    yield buffer[start:index+1]
+    start=index+1
+  yield buffer[start:]
+
+def iter_sentence_split(tokens,lang,boundary=is_boundary):
+  """Splits a stream of tokens into sentences, vectorised if NumPy is installed"""
+  if load_numpy():
+    return iter_split_marks(tokens,lang,boundary)
+  return iter_split_at(tokens,lang,boundary)
+
+def iter_sentence_split_nonstd(tokens,lang):
+  return iter_sentence_split(tokens,lang,is_boundary_nonstd)
 
 process={'standard':lambda x,y,z:sentence_split(tokenize(x,y),z),'nonstandard':lambda x,y,z:sentence_split_nonstd(tokenize(x,y),z)}
 
@@ -171,6 +431,8 @@ def usage():
   sys.exit(1)
 
 if __name__=='__main__':
+  from signal import signal, SIGPIPE, SIG_DFL
+  signal(SIGPIPE,SIG_DFL)
   if len(sys.argv)!=3:
     usage()
   lang,mode=sys.argv[1:3]
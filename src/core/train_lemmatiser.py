@@ -6,20 +6,7 @@ from sklearn.tree import DecisionTreeClassifier
 from sklearn.pipeline import Pipeline
 import cPickle as pickle
 import sys
-
-def suffix(token,n):
-  if len(token)>n:
-    return token[-n:]
-
-def extract_features_lemma(token):
-  features={}
-  for i in range(4):
-    suf=suffix(token,i+1)
-    if suf!=None:
-      features['suf'+str(i+1)]=suf
-  if len(token)>3:
-    features['pref3']=token[:3]
-  return features
+from features import extract_features_lemma
 
 if __name__=='__main__':
   lexicon=pickle.load(open(sys.argv[1]+'.train'))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from janes_ner_db import DB
+
+
+class ArchiveDB(DB):
+    '''Index of the archived results, maps the request ids of a user to their parts in the segment files'''
+
+    def __init__(self, path):
+        '''
+        @param path: path of the index database
+        @type path: string
+        '''
+        super(ArchiveDB, self).__init__(DB._THE_MAGIC_WORD)
+        self._path = path
+        self.connection().execute('PRAGMA journal_mode = WAL')
+        self.__createTables()
+
+    def __createTables(self):
+        """
+        Creates the table of archived parts
+        """
+        statement = """
+            CREATE TABLE IF NOT EXISTS parts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                request_id TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                received TEXT NOT NULL
+            );
+        """
+        self.command(statement)
+        self.command("CREATE INDEX IF NOT EXISTS parts_request ON parts(request_id, user_id)")
+        self.command("CREATE INDEX IF NOT EXISTS parts_segment ON parts(segment)")
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import os
+import sqlite3
+import threading
 
 def dict_factory(cursor, row):
     d = {}
@@ -10,15 +13,20 @@ def dict_factory(cursor, row):
 class DB(object):
     """
     Base class which is used for accessing the database.
-    Contains a database connection and basic operations for executing queries.
+    Keeps a connection per thread (or greenlet, when threading is monkey patched) and basic operations for
+    executing queries. SELECT queries run on a separate read-only connection.
     """
     # Must be passed into the constructor. Ensures the constructor is private
     _THE_MAGIC_WORD = object()
 
+    # Number of prepared statements kept by each connection
+    CACHED_STATEMENTS = 100
+
     # Private object constructor
     def __init__(self, token):
-        self._connection = None
-        self._client = None
+        self._path = None
+        self._local = threading.local()
+        self._pid = os.getpid()
         if token is not self._THE_MAGIC_WORD:
             raise ValueError('This is a private constructor. Plase use ::getInstance()')
 
@@ -26,30 +34,63 @@ class DB(object):
     def set_row_factory(connection):
         connection.row_factory = dict_factory
 
+    def _connect(self, readonly):
+        connection = sqlite3.connect(self._path, isolation_level=None, cached_statements=DB.CACHED_STATEMENTS)
+        connection.text_factory = str
+        self.set_row_factory(connection)
+        if readonly:
+            connection.execute('PRAGMA query_only = ON')
+        return connection
+
+    def connection(self, readonly=False):
+        '''Returns the connection of the calling thread'''
+        if self._path is None:
+            raise ValueError("Client not initialized")
+
+        if self._pid != os.getpid():
+            # Connections inherited from the parent process must not be used after a fork
+            self._pid = os.getpid()
+            self._local = threading.local()
+
+        name = 'reader' if readonly else 'writer'
+        connection = getattr(self._local, name, None)
+        if connection is None:
+            connection = self._connect(readonly)
+            setattr(self._local, name, connection)
+        return connection
+
     # Method to execute sql query
-    def query(self, sql):
+    def query(self, sql, params = ()):
         '''Execute a SELECT SQL query'''
-        if not self._client:
-            raise ValueError("Client not initialized") 
-
-        self._client.execute(sql)
-        self._connection.commit()
-        return self._client.fetchall()
+        return self.connection(readonly=True).execute(sql, params).fetchall()
 
     # Method to execute sql command
     def command(self, sql, params = ()):
-        '''Execute an SQL command (INSERT, UPDATE or DELETE)'''
-        if not self._client:
-            raise ValueError("Client not initialized")
+        '''Execute an SQL command (INSERT, UPDATE or DELETE), returns the number of affected rows'''
+        cursor = self.connection().execute(sql, params)
+        self._local.lastrowid = cursor.lastrowid
+        return cursor.rowcount
+
+    # Method to execute sql commands in a transaction
+    def commandMany(self, sql, params_list):
+        '''Execute an SQL command once for every parameter tuple, all in a single transaction'''
+        self.transaction([(sql, params_list)])
 
-        self._client.execute(sql, params)
-        self._connection.commit()
+    # Method to execute several sql commands in a transaction
+    def transaction(self, commands):
+        '''Execute (SQL command, list of parameter tuples) pairs in a single transaction'''
+        connection = self.connection()
+        # Takes the write lock immediately, so concurrent processes serialise on the whole transaction
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params_list in commands:
+                connection.executemany(sql, params_list)
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
 
     # Method to execute sql command
     def script(self, sql):
         '''Execute an SQL script'''
-        if not self._client:
-            raise ValueError("Client not initialized")
-
-        self._client.executescript(sql)
-        self._connection.commit()
+        self.connection().executescript(sql)
@@ -8,6 +8,7 @@ class QueryExpression(object):
         self.__select = []
         self.__from = None
         self.__where = []
+        self.__params = []
 
     def select(self, fields):
         self.__select = fields
@@ -18,10 +19,15 @@ class QueryExpression(object):
         return self;
 
     def where(self, field, operator, value):
-        expression = "{0} {1} '{2}'".format(field, operator, value)
+        # Values are bound, so equal queries share the same SQL text and its prepared statement
+        expression = "{0} {1} ?".format(field, operator)
         self.__where.append(expression)
+        self.__params.append(value)
         return self
 
+    def params(self):
+        return tuple(self.__params)
+
     def toSQL(self):
 
         # Ensure table is set
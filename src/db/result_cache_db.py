@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from janes_ner_db import DB
+
+
+class ResultCacheDB(DB):
+    '''On-disk tier of the result cache, stores serialized tagging results by their content hash'''
+
+    def __init__(self, path):
+        '''
+        @param path: path of the cache database
+        @type path: string
+        '''
+        super(ResultCacheDB, self).__init__(DB._THE_MAGIC_WORD)
+        self._path = path
+        self.connection().execute('PRAGMA journal_mode = WAL')
+        self.__createTables()
+
+    def __createTables(self):
+        """
+        Creates the tables of cached results and of the model versions
+        """
+        statement = """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL
+            );
+        """
+        self.command(statement)
+        # Model version of every language whose results are cached, results of replaced versions are dropped
+        self.command("CREATE TABLE IF NOT EXISTS versions (lang TEXT PRIMARY KEY, version TEXT NOT NULL)")
+        self.command("CREATE INDEX IF NOT EXISTS results_version ON results(version)")
+        self.command("CREATE INDEX IF NOT EXISTS results_created ON results(created)")
@@ -1,7 +1,6 @@
 
 # -*- coding: utf-8 -*-
 import os
-import sqlite3
 import sys
 
 srcPath = os.path.realpath('../')
@@ -29,12 +28,10 @@ class UsersDB(DB):
         databaseName = assetsPath + '/users';
         if (UsersDB._instance is None):
             UsersDB._instance = UsersDB(DB._THE_MAGIC_WORD)
-            if (UsersDB._instance._connection is None):
-                # Initialize connection
-                UsersDB._instance._connection = sqlite3.connect(databaseName,isolation_level=None)
-                UsersDB._instance._connection.text_factory = str
-                UsersDB._instance._connection.row_factory = dict_factory
-                UsersDB._instance._client = UsersDB._instance._connection.cursor()
+            # Connections are opened per thread on first use
+            UsersDB._instance._path = databaseName
+            # Readers do not block the writer and the writer does not block readers, the mode is stored in the file
+            UsersDB._instance.connection().execute('PRAGMA journal_mode = WAL')
 
             UsersDB._instance.__createTables()
 
@@ -42,9 +39,9 @@ class UsersDB(DB):
 
     def getInsertId(self):
         """
-        Returns the id of the last inserted record.
+        Returns the id of the last record inserted by the calling thread.
         """
-        return self._client.lastrowid
+        return getattr(self._local, 'lastrowid', None)
 
     def reset(self):
         """
@@ -53,6 +50,7 @@ class UsersDB(DB):
 
         self.command("DROP TABLE IF EXISTS users")
         self.command("DROP TABLE IF EXISTS auth_tokens")
+        self.command("DROP TABLE IF EXISTS jobs")
         self.__createTables()
 
     def __createTables(self):
@@ -99,3 +97,29 @@ class UsersDB(DB):
             );
         """
         db.command(statement)
+
+        # Tokens are looked up on every request, users by username and email are covered by their unique indexes
+        db.command("CREATE INDEX IF NOT EXISTS auth_tokens_token ON auth_tokens(token)")
+
+        # Create tagging jobs table
+        statement = """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                lang TEXT NOT NULL,
+                input_format TEXT NOT NULL,
+                format TEXT NOT NULL,
+                status TEXT NOT NULL,
+                sentences_total INTEGER,
+                sentences_done INTEGER NOT NULL DEFAULT 0,
+                input_path TEXT NOT NULL,
+                result_path TEXT NOT NULL,
+                error TEXT,
+                claim TEXT,
+                updated TEXT NOT NULL,
+                created TEXT NOT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+                CHECK (status IN ("queued", "running", "done", "failed"))
+            );
+        """
+        db.command(statement)
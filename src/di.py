@@ -25,3 +25,6 @@ class DependencyContainer(object):
             self.instances[key] = function()
 
         return self.instances[key]
+
+    def __contains__(self, key):
+        return key in self.initializers
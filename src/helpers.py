@@ -1,7 +1,11 @@
 import json
+from collections import OrderedDict
+try:
+    import ujson
+except ImportError:
+    ujson = None
 from flask import make_response
 from lxml import etree
-from StringIO import StringIO
 import hashlib, uuid
 from datetime import datetime, timedelta
 import pytz
@@ -58,11 +62,24 @@ def isset(v):
     return v is not None and v.strip() != ''
 
 
-def jsonify(data, ensure_ascii=False, status=200, indent=4, sort_keys=True):
+def dumps_compact(data, ensure_ascii=False):
+    """
+    Serializes an object into json without whitespace or key sorting, with ujson when it is installed
+    """
+    if ujson is not None:
+        return ujson.dumps(data, ensure_ascii=ensure_ascii, escape_forward_slashes=False)
+    return json.dumps(data, ensure_ascii=ensure_ascii, separators=(',', ':'))
+
+
+def jsonify(data, ensure_ascii=False, status=200, indent=4, sort_keys=True, compact=False):
     """
     Serializes an object into a HTTP json response
     """
-    response = make_response(json.dumps(data, ensure_ascii=ensure_ascii, indent=indent, sort_keys=sort_keys))
+    if compact:
+        body = dumps_compact(data, ensure_ascii=ensure_ascii)
+    else:
+        body = json.dumps(data, ensure_ascii=ensure_ascii, indent=indent, sort_keys=sort_keys)
+    response = make_response(body)
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     response.headers['mimetype'] = 'application/json'
     response.status_code = status
@@ -96,33 +113,39 @@ def jsonTCF(lang, text, result, lemma_idx=None, tag_idx=None, correction_idx=Non
     token_id = 0
     for s_idx, sentence in enumerate(result):
         token_ids = []
-
-        for token in sentence:
+        lemmas = sentence.column(lemma_idx) if lemma_idx is not None else None
+        tags = sentence.column(tag_idx) if tag_idx is not None else None
+        corrections = sentence.column(correction_idx) if correction_idx is not None else None
+
+        for idx in xrange(len(sentence)):
+            # The ID strings are built once per token and shared by all layers
+            number = str(token_id)
+            tid = 't_' + number
             output['tokens'].append({
-                'ID': "t_" + str(token_id),
-                'startChar': str(token[0][1]),
-                'endChar': str(token[0][2]),
-                'value': token[0][0]
+                'ID': tid,
+                'startChar': str(sentence.starts[idx]),
+                'endChar': str(sentence.ends[idx]),
+                'value': sentence.tokens[idx]
             })
-            token_ids.append("t_" + str(token_id))
-            if lemma_idx is not None:
+            token_ids.append(tid)
+            if lemmas is not None:
                 output['lemmas'].append({
-                    'ID': 'le_' + str(token_id),
-                    'tokenIDs': 't_' + str(token_id),
-                    'value': token[lemma_idx]
+                    'ID': 'le_' + number,
+                    'tokenIDs': tid,
+                    'value': lemmas[idx]
                 })
 
-            if tag_idx is not None:
+            if tags is not None:
                 output['POSTags'].append({
-                    'ID': 'pt_' + str(token_id),
-                    'tokenIDs': 't_' + str(token_id),
-                    'value': token[tag_idx]
+                    'ID': 'pt_' + number,
+                    'tokenIDs': tid,
+                    'value': tags[idx]
                 })
-            if correction_idx is not None:
+            if corrections is not None:
                 output['orthography'].append({
-                    'ID': 'pt_' + str(token_id),
-                    'tokenIDs': 't_' + str(token_id),
-                    'value': token[correction_idx]
+                    'ID': 'pt_' + number,
+                    'tokenIDs': tid,
+                    'value': corrections[idx]
                 })
 
             token_id += 1
@@ -147,59 +170,176 @@ def jsonTCF(lang, text, result, lemma_idx=None, tag_idx=None, correction_idx=Non
     return output
 
 
-def TCF(lang, text, result, lemma_idx=None, tag_idx=None, correction_idx=None, output_sentences=True):
+def jsonCompact(text, result, tag_idx=None, ner_idx=None):
     """
-    Transforms an object into a TCF response
+    Transforms an object into a columnar API json response, parallel arrays with one entry per token.
+    Sentences are given by the index of their first token.
     """
-    output = ''
-    sentence_output = ''
-    token_output = ''
-    tags_output = ''
-    lemmas_output = ''
-    orthography_output = ''
+    output = {
+        'text': text,
+        'tokens': [],
+        'startChar': [],
+        'endChar': [],
+        'sentences': []
+    }
+    if tag_idx is not None:
+        output['POSTags'] = []
+    if ner_idx is not None:
+        output['NE'] = []
+
+    for sentence in result:
+        output['sentences'].append(len(output['tokens']))
+        output['tokens'].extend(sentence.tokens)
+        output['startChar'].extend(sentence.starts)
+        output['endChar'].extend(sentence.ends)
+        if tag_idx is not None:
+            output['POSTags'].extend(sentence.column(tag_idx))
+        if ner_idx is not None:
+            output['NE'].extend(sentence.column(ner_idx))
 
-    token_id = 0
-    for s_idx, sentence in enumerate(result):
-        token_ids = []
-        for token in sentence:
-            token_output += "<token ID=\"t_{0}\" startChar=\"{1}\" endChar=\"{2}\">{3}</token>".format(token_id,
-                                                                                                           token[0][1],
-                                                                                                           token[0][2],
-                                                                                                           token[0][0])
-            token_ids.append("t_" + str(token_id))
+    return output
+
+
+DSPIN_NS = 'http://www.dspin.de/data'
+METADATA_NS = 'http://www.dspin.de/data/metadata'
+TEXTCORPUS_NS = 'http://www.dspin.de/data/textcorpus'
+
+
+class _Chunks(object):
+    """
+    File-like object collecting the output of an xmlfile, so the output can be sent while it is written
+    """
+    def __init__(self):
+        self.chunks = []
 
-            if lemma_idx is not None:
-                lemmas_output += "<lemma ID=\"le_{0}\" tokenIDs=\"t_{0}\">{1}</lemma>".format(token_id,
-                                                                                                  token[lemma_idx])
+    def write(self, data):
+        self.chunks.append(data)
 
-            if tag_idx is not None:
-                tags_output += "<tag ID=\"pt_{0}\" tokenIDs=\"t_{0}\">{1}</tag>".format(token_id, token[tag_idx])
+    def drain(self):
+        data = ''.join(self.chunks)
+        del self.chunks[:]
+        return data
 
-            if correction_idx is not None:
-                orthography_output += "<correction ID=\"pt_{0}\" tokenIDs=\"t_{0}\">{1}</correction>".format(token_id, token[correction_idx])
 
+def _xml_text(value):
+    return value.decode('utf-8') if isinstance(value, str) else unicode(value)
+
+
+def _tcf_layer(xf, out, result, name, item, prefix, idx, attributes=None):
+    """
+    Writes a layer with one element per token, yields the output after each sentence
+    """
+    tc = '{' + TEXTCORPUS_NS + '}'
+    xf.write('\n    ')
+    with xf.element(tc + name, attributes or {}):
+        token_id = 0
+        for sentence in result:
+            values = sentence.column(idx)
+            for i in xrange(len(sentence)):
+                xf.write('\n      ')
+                if idx == 0:
+                    with xf.element(tc + item, OrderedDict([('ID', prefix + str(token_id)),
+                                                            ('startChar', str(sentence.starts[i])),
+                                                            ('endChar', str(sentence.ends[i]))])):
+                        xf.write(_xml_text(values[i]))
+                else:
+                    with xf.element(tc + item, OrderedDict([('ID', prefix + str(token_id)),
+                                                            ('tokenIDs', 't_' + str(token_id))])):
+                        xf.write(_xml_text(values[i]))
+                token_id += 1
+            xf.flush()
+            yield out.drain()
+        if token_id > 0:
+            xf.write('\n    ')
+
+
+def TCF(lang, text, result, lemma_idx=None, tag_idx=None, correction_idx=None, output_sentences=True):
+    """
+    Transforms an object into a TCF response, yields the document in chunks while it is written.
+    The result is iterated once per layer.
+    """
+    out = _Chunks()
+    tc = '{' + TEXTCORPUS_NS + '}'
+    has_tokens = any(len(sentence) > 0 for sentence in result)
+
+    with etree.xmlfile(out, encoding='utf-8') as xf:
+        with xf.element('{' + DSPIN_NS + '}D-Spin', nsmap={None: DSPIN_NS}, version='0.4'):
+            xf.write('\n  ')
+            xf.write(etree.Element('{' + METADATA_NS + '}MetaData', nsmap={None: METADATA_NS}))
+            xf.write('\n  ')
+            with xf.element(tc + 'TextCorpus', nsmap={None: TEXTCORPUS_NS}, lang=lang):
+                xf.write('\n    ')
+                with xf.element(tc + 'text'):
+                    xf.write(_xml_text(text))
+
+                for chunk in _tcf_layer(xf, out, result, 'tokens', 'token', 't_', 0):
+                    yield chunk
+
+                if output_sentences:
+                    xf.write('\n    ')
+                    with xf.element(tc + 'sentences'):
+                        token_id = 0
+                        s_idx = -1
+                        for s_idx, sentence in enumerate(result):
+                            token_ids = ['t_' + str(token_id + i) for i in range(len(sentence))]
+                            token_id += len(sentence)
+                            xf.write('\n      ')
+                            with xf.element(tc + 'sentence', OrderedDict([('ID', 's_' + str(s_idx)),
+                                                                          ('tokenIDs', ' '.join(token_ids))])):
+                                pass
+                        if s_idx >= 0:
+                            xf.write('\n    ')
+
+                layers = [('lemmas', 'lemma', 'le_', lemma_idx, None),
+                          ('POStags', 'tag', 'pt_', tag_idx, {'tagset': 'mte-hr-v4r'}),
+                          ('orthography', 'correction', 'pt_', correction_idx, None)]
+                for name, item, prefix, idx, attributes in layers:
+                    if has_tokens and idx is not None:
+                        for chunk in _tcf_layer(xf, out, result, name, item, prefix, idx, attributes):
+                            yield chunk
+                xf.write('\n  ')
+            xf.write('\n')
+
+    yield out.drain() + '\n'
+
+
+def TSV(result, tag_idx=None, lemma_idx=None, ner_idx=None):
+    """
+    Transforms a tagged result into tab separated lines (token, tag, lemma, named entity, offsets),
+    sentences are separated by an empty line
+    """
+    for sentence in result:
+        values = [sentence.column(idx) for idx in (tag_idx, lemma_idx, ner_idx) if idx is not None]
+        for i in xrange(len(sentence)):
+            columns = [sentence.tokens[i]]
+            for column in values:
+                columns.append(column[i])
+            columns.append(str(sentence.starts[i]) + ' - ' + str(sentence.ends[i]))
+            yield u'\t'.join(columns) + u'\n'
+        yield u'\n'
+
+
+def JSONL(result, tag_idx=None, ner_idx=None):
+    """
+    Transforms a tagged result into JSON lines, one sentence per line, so it can be streamed
+    """
+    token_id = 0
+    for s_idx, sentence in enumerate(result):
+        tokens = []
+        tags = sentence.column(tag_idx) if tag_idx is not None else None
+        ners = sentence.column(ner_idx) if ner_idx is not None else None
+        for idx in xrange(len(sentence)):
+            output = {
+                'ID': 't_' + str(token_id),
+                'startChar': str(sentence.starts[idx]),
+                'endChar': str(sentence.ends[idx]),
+                'value': sentence.tokens[idx]
+            }
+            if tags is not None:
+                output['POSTag'] = tags[idx]
+            if ners is not None:
+                output['NE'] = ners[idx]
+            tokens.append(output)
             token_id += 1
 
-        sentence_output += "<sentence ID=\"s_{0}\" tokenIDs=\"{1}\" />".format(s_idx, " ".join(token_ids))
-
-    output += "<tokens>" + token_output + "</tokens>"
-    if output_sentences:
-        output += "<sentences>" + sentence_output + "</sentences>"
-    if not empty(lemmas_output):
-        output += "<lemmas>" + lemmas_output + "</lemmas>"
-    if not empty(tags_output):
-        output += "<POStags tagset=\"mte-hr-v4r\">" + tags_output + "</POStags>"
-    if not empty(orthography_output):
-        output += "<orthography>" + orthography_output + "</orthography>"
-
-    output = """<?xml version="1.0" encoding="UTF-8"?>
-    <D-Spin xmlns="http://www.dspin.de/data" version="0.4">
-        <MetaData xmlns="http://www.dspin.de/data/metadata"/>
-        <TextCorpus xmlns="http://www.dspin.de/data/textcorpus" lang="{0}">
-            <text>{2}</text>
-            {1}
-        </TextCorpus>
-    </D-Spin>""".format(lang, output, text)
-
-    x = etree.parse(StringIO(output), etree.XMLParser(remove_blank_text=True))
-    return etree.tostring(x.getroot(), pretty_print=True)
+        yield json.dumps({'ID': 's_' + str(s_idx), 'tokens': tokens}, ensure_ascii=False) + u'\n'
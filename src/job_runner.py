@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import marshal
+import threading
+import traceback
+
+from .helpers import jsonTCF, TCF, TSV
+from . import tcf
+from .models.job_model import JobModel, ClaimLost
+from .core.sentence import Sentence
+
+
+class SentenceSpool(object):
+    '''
+    Tagged sentences of a job spooled to a file, so they can be iterated (once per output layer) without being held
+    in memory
+    '''
+
+    def __init__(self, path):
+        '''
+        @param path: path of the spool file, removed by remove
+        @type path: string
+        '''
+        self.path = path
+        self._file = open(path, 'wb')
+
+    def extend(self, sentences):
+        for sentence in sentences:
+            marshal.dump(sentence.pack(), self._file, 2)
+
+    def finish(self):
+        self._file.close()
+
+    def remove(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    packed = marshal.load(f)
+                except EOFError:
+                    return
+                yield Sentence.unpack(packed)
+
+
+class JobRunner(object):
+    '''Runs queued tagging jobs in background threads of the current process'''
+
+    # Number of sentences tagged between two progress updates
+    CHUNK_SENTENCES = 100
+
+    # Seconds to wait before polling the queue again when it is empty
+    POLL_INTERVAL = 1.0
+
+    # Seconds between two heartbeats of a running job, well below the time after which it is requeued
+    HEARTBEAT_INTERVAL = JobModel.STALE_SECONDS / 10
+
+    # Seconds finished jobs and their files are kept for, and between two removals of the expired ones
+    RETENTION = 7 * 86400
+    EXPIRE_INTERVAL = 3600
+
+    def __init__(self, dc, workers=1, chunk_sentences=CHUNK_SENTENCES, retention=RETENTION):
+        '''
+        @param dc: dependency injection container with the segmenters and taggers
+        @type dc: DependencyContainer
+        @param workers: number of background threads running jobs
+        @type workers: int
+        @param chunk_sentences: number of sentences tagged between two progress updates
+        @type chunk_sentences: int
+        @param retention: seconds finished jobs and their results are kept for after they finished
+        @type retention: int
+        '''
+        self.dc = dc
+        self.workers = workers
+        self.chunk_sentences = chunk_sentences
+        self.retention = retention
+        self._pid = None
+        self._expired = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker threads. Threads do not survive a fork, so they are started again by the first call in
+        each forked process.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            for idx in range(self.workers):
+                thread = threading.Thread(target=self._work, name='job-runner-' + str(idx))
+                thread.daemon = True
+                thread.start()
+
+    def _work(self):
+        while True:
+            try:
+                job = JobModel.claimNext()
+            except Exception:
+                traceback.print_exc()
+                job = None
+
+            if job is None:
+                self._removeExpiredPeriodically()
+                time.sleep(JobRunner.POLL_INTERVAL)
+            else:
+                self.run(job)
+
+    def _removeExpiredPeriodically(self):
+        with self._lock:
+            if time.time() - self._expired < JobRunner.EXPIRE_INTERVAL:
+                return
+            self._expired = time.time()
+        try:
+            self.removeExpired()
+        except Exception:
+            traceback.print_exc()
+
+    def removeExpired(self):
+        """
+        Deletes the jobs which finished more than the retention ago with their input and result files
+        """
+        for job in JobModel.expired(self.retention):
+            for path in (job.input_path, job.result_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            job.delete()
+
+    def _beat(self, job, stopped):
+        while not stopped.wait(JobRunner.HEARTBEAT_INTERVAL):
+            try:
+                job.heartbeat()
+            except Exception:
+                # The job was claimed again, the saves of the runner fail from now on
+                return
+
+    def run(self, job):
+        """
+        Tags the input of a job in chunks of sentences, reporting the progress after each chunk. The text is segmented
+        lazily and the tagged sentences are spooled to disk, only the text and a chunk are held in memory.
+        A heartbeat keeps the claim of the job alive while it runs. If the job is claimed again by another runner
+        anyway, the saves of this one fail and it leaves the files of the job to the new claim.
+        """
+        spool = None
+        owned = True
+        stopped = threading.Event()
+        heartbeat = threading.Thread(target=self._beat, args=(job, stopped), name='job-heartbeat-' + str(job.id))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            with open(job.input_path, 'rb') as f:
+                if job.input_format == 'tcf':
+                    text = tcf.text(f)
+                else:
+                    text = f.read().decode('utf-8')
+
+            # Leased for the whole job, so an eviction of the language does not close the tagger between chunks
+            with self.dc['models'].lease(job.lang) as components:
+                segmenter = components['segmenter']
+                job.start(sum(1 for sentence in segmenter.iter_segment(text)))
+
+                spool = SentenceSpool(job.result_path + '.' + job.claim + '.sentences')
+                chunk = []
+                for sentence in segmenter.iter_segment(text):
+                    chunk.append(sentence)
+                    if len(chunk) == self.chunk_sentences:
+                        spool.extend(components['ner_tagger'].tag(chunk, vert=True))
+                        job.progress(len(chunk))
+                        chunk = []
+                if len(chunk) > 0:
+                    spool.extend(components['ner_tagger'].tag(chunk, vert=True))
+                    job.progress(len(chunk))
+                spool.finish()
+
+            self.write(job, text, spool)
+            job.finish()
+        except ClaimLost:
+            traceback.print_exc()
+            owned = False
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                job.fail(str(e))
+            except ClaimLost:
+                owned = False
+        finally:
+            stopped.set()
+            if spool is not None:
+                spool.remove()
+            if os.path.exists(job.result_path + '.' + job.claim + '.tmp'):
+                os.remove(job.result_path + '.' + job.claim + '.tmp')
+            # The input is read again by the runner which claimed the job since
+            if owned and os.path.exists(job.input_path):
+                os.remove(job.input_path)
+
+    def write(self, job, text, result):
+        """
+        Writes the result of a job in its output format, tcf and tsv are written while the result is read. The
+        result replaces the file of the job only while the runner still holds its claim.
+        """
+        tmp_path = job.result_path + '.' + job.claim + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            if job.format == 'json':
+                # The JSON document is built as a whole
+                output = json.dumps(jsonTCF(job.lang, text, list(result), tag_idx=1), ensure_ascii=False, indent=4,
+                                    sort_keys=True)
+                f.write(output.encode('utf-8') if isinstance(output, unicode) else output)
+            else:
+                if job.format == 'tcf':
+                    chunks = TCF(job.lang, text, result, tag_idx=1)
+                else:
+                    chunks = (line.encode('utf-8') for line in TSV(result, tag_idx=1, ner_idx=2))
+                for chunk in chunks:
+                    f.write(chunk)
+        job.heartbeat()
+        os.rename(tmp_path, job.result_path)
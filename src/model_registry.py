@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+import time
+import resource
+import threading
+import traceback
+from contextlib import contextmanager
+from collections import OrderedDict
+
+
+def rss_bytes():
+    """
+    Returns the resident memory of the process, the peak resident memory where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry(object):
+    '''
+    Loads the models of a language (segmenter, tagger and NER stack) on the first request for it and unloads the
+    least recently used languages when the loaded models exceed a memory budget. Every language is loaded by a
+    single thread, requests for it wait for the load while other languages stay available.
+    The memory of a language is the size of its model files reported by the loader, the growth of the resident
+    memory is not attributable to a language when languages load concurrently or reuse freed memory.
+    Requests lease the components they use (acquire and release, or lease), evicted components are closed when
+    the last lease on them is released.
+    '''
+
+    def __init__(self, langs, loader, max_bytes=None):
+        '''
+        @param langs: languages which can be loaded
+        @type langs: list
+        @param loader: function building the components of a language, a dict by component name, with the
+            seconds of every loading phase under 'phases' and the memory of the models under 'model_bytes'
+        @type loader: function
+        @param max_bytes: memory budget of the loaded models, unbounded if None
+        @type max_bytes: int
+        '''
+        self.langs = list(langs)
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._langLocks = dict((lang, threading.Lock()) for lang in self.langs)
+        # lang -> components, least recently used first
+        self._loaded = OrderedDict()
+        # id of the components -> number of leases on them
+        self._leases = {}
+        # id of the components -> evicted components waiting for their leases to be released
+        self._evicted = {}
+        self._stats = dict((lang, {'loads': 0, 'evictions': 0, 'load_seconds': None, 'phases': {}, 'model_bytes': None})
+                           for lang in self.langs)
+
+    def __contains__(self, lang):
+        return lang in self._langLocks
+
+    def get(self, lang, component='ner_tagger'):
+        """
+        Returns a component of a language, loading the language first if needed. The component is not leased, it
+        may be closed by an eviction while it is used.
+        """
+        return self._get(lang, False)[component]
+
+    def acquire(self, lang):
+        """
+        Returns the components of a language, loading the language first if needed, and leases them until they
+        are released. Leased components are not closed when their language is evicted.
+        """
+        return self._get(lang, True)
+
+    def release(self, components):
+        """
+        Releases a lease on the components returned by acquire, closes them if they were evicted meanwhile
+        """
+        with self._lock:
+            key = id(components)
+            self._leases[key] -= 1
+            if self._leases[key] > 0:
+                return
+            del self._leases[key]
+            evicted = self._evicted.pop(key, None)
+
+        if evicted is not None:
+            self._close(evicted)
+
+    @contextmanager
+    def lease(self, lang):
+        """
+        Leases the components of a language for the duration of a with block
+        """
+        components = self.acquire(lang)
+        try:
+            yield components
+        finally:
+            self.release(components)
+
+    def _get(self, lang, leased):
+        if lang not in self:
+            raise KeyError('Unknown language ' + lang)
+
+        with self._lock:
+            components = self._loaded.pop(lang, None)
+            if components is not None:
+                self._loaded[lang] = components
+                if leased:
+                    self._lease(components)
+                return components
+
+        return self.load(lang, leased)
+
+    def _lease(self, components):
+        self._leases[id(components)] = self._leases.get(id(components), 0) + 1
+
+    def load(self, lang, leased=False):
+        """
+        Loads the components of a language unless they are loaded, evicts other languages beyond the memory budget
+        """
+        with self._langLocks[lang]:
+            with self._lock:
+                if lang in self._loaded:
+                    components = self._loaded[lang]
+                    if leased:
+                        self._lease(components)
+                    return components
+
+            start = time.time()
+            components = self.loader(lang)
+            stats = self._stats[lang]
+            stats['load_seconds'] = time.time() - start
+            stats['phases'] = components.get('phases', {})
+            stats['model_bytes'] = components.get('model_bytes', 0)
+            stats['loads'] += 1
+
+            with self._lock:
+                self._loaded[lang] = components
+                if leased:
+                    self._lease(components)
+                evicted = self._evict(lang)
+                # Components still leased by requests are closed by the release of their last lease
+                for unloaded in list(evicted):
+                    if id(unloaded) in self._leases:
+                        self._evicted[id(unloaded)] = unloaded
+                        evicted.remove(unloaded)
+
+        for unloaded in evicted:
+            self._close(unloaded)
+        return components
+
+    def _evict(self, keep):
+        """
+        Removes the least recently used languages until the loaded ones fit the budget, returns their components
+        """
+        evicted = []
+        if self.max_bytes is None:
+            return evicted
+
+        for lang in list(self._loaded.keys()):
+            if sum(self._stats[e]['model_bytes'] for e in self._loaded) <= self.max_bytes:
+                break
+            if lang == keep:
+                continue
+            evicted.append(self._loaded.pop(lang))
+            self._stats[lang]['evictions'] += 1
+        return evicted
+
+    def _close(self, components):
+        # No request holds a lease on the components, pools are closed once their pending work is done
+        for component in components.values():
+            if hasattr(component, 'close'):
+                thread = threading.Thread(target=self._closeComponent, args=(component,), name='model-close')
+                thread.daemon = True
+                thread.start()
+
+    @staticmethod
+    def _closeComponent(component):
+        try:
+            component.close()
+        except Exception:
+            traceback.print_exc()
+
+    def loaded(self):
+        """
+        Returns the components of the loaded languages by language
+        """
+        with self._lock:
+            return OrderedDict(self._loaded)
+
+    def stats(self):
+        """
+        Returns the load time and its phases, memory and number of loads and evictions of every language
+        """
+        with self._lock:
+            languages = {}
+            for lang in self.langs:
+                languages[lang] = dict(self._stats[lang])
+                languages[lang]['loaded'] = lang in self._loaded
+            return {
+                'languages': languages,
+                'leases': sum(self._leases.values()),
+                'rss_bytes': rss_bytes(),
+                'max_bytes': self.max_bytes
+            }
+
+
+class ReleasingIterator(object):
+    '''
+    Iterable of a streamed response which releases the lease on the components producing it once the response is
+    closed, whether it was consumed or not
+    '''
+
+    def __init__(self, iterable, release):
+        '''
+        @param iterable: the streamed response
+        @type iterable: iterator
+        @param release: function releasing the lease, called once
+        @type release: function
+        '''
+        self.iterable = iterable
+        self._release = release
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, 'close'):
+                self.iterable.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
@@ -0,0 +1,139 @@
+import uuid
+from model import Model, date_handler
+from ..db.users_db import UsersDB
+from datetime import datetime, timedelta
+
+
+class ClaimLost(Exception):
+    """
+    Raised when a runner saves a job which was claimed again by another runner
+    """
+    pass
+
+
+class JobModel(Model):
+
+    # Seconds after which a running job whose progress was not saved is considered abandoned by a dead process
+    STALE_SECONDS = 600
+
+    @classmethod
+    def model_props(cls):
+        return [
+            'user_id', 'lang', 'input_format', 'format', 'status', 'sentences_total', 'sentences_done',
+            'input_path', 'result_path', 'error', 'claim'
+        ]
+
+    @classmethod
+    def table_name(cls):
+        return 'jobs'
+
+    @classmethod
+    def primary_key(cls):
+        return 'id'
+
+    # Object constructor
+    def __init__(self):
+        Model.__init__(self)
+
+    def isDone(self):
+        return self.status == 'done'
+
+    def isFailed(self):
+        return self.status == 'failed'
+
+    def start(self, sentences_total):
+        self.sentences_total = sentences_total
+        self.sentences_done = 0
+        self.saveClaimed()
+
+    def progress(self, sentences):
+        self.sentences_done += sentences
+        self.saveClaimed()
+
+    def heartbeat(self):
+        """
+        Marks the claim of the runner as alive, so the job is not requeued as abandoned. Only the update time is
+        written, so it can be called from another thread than the one running the job.
+        """
+        if UsersDB.getInstance().command("UPDATE jobs SET updated = ? WHERE id = ? AND claim = ?",
+                                         (datetime.now(), self.id, self.claim)) != 1:
+            raise ClaimLost('Job {0} was claimed by another runner'.format(self.id))
+
+    def finish(self):
+        self.status = 'done'
+        self.saveClaimed()
+
+    def fail(self, error):
+        self.status = 'failed'
+        self.error = error
+        self.saveClaimed()
+
+    def saveClaimed(self):
+        """
+        Saves a job claimed by a runner, raises ClaimLost if the job has been claimed again since
+        """
+        self.updated = datetime.now()
+        values = self.toDbModel()
+        keys = sorted(values)
+        sql = "UPDATE jobs SET {0} WHERE id = ? AND claim = ?".format(", ".join(key + " = ?" for key in keys))
+        if UsersDB.getInstance().command(sql, [values[key] for key in keys] + [self.id, self.claim]) != 1:
+            raise ClaimLost('Job {0} was claimed by another runner'.format(self.id))
+
+    def toDict(self):
+        return {
+            'id': self.id,
+            'lang': self.lang,
+            'format': self.format,
+            'status': self.status,
+            'sentences_total': self.sentences_total,
+            'sentences_done': self.sentences_done,
+            'error': self.error,
+            'created': date_handler(self.created),
+            'updated': date_handler(self.updated)
+        }
+
+    @classmethod
+    def requeueStale(cls):
+        """
+        Queues the running jobs whose runner has not saved them for STALE_SECONDS again, their process died. The
+        claim is dropped, so the runner can no longer save the job if it was only stalled.
+        """
+        stale = datetime.now() - timedelta(seconds=cls.STALE_SECONDS)
+        return UsersDB.getInstance().command(
+            "UPDATE jobs SET status = 'queued', claim = NULL, updated = ? WHERE status = 'running' AND updated < ?",
+            (datetime.now(), stale))
+
+    @classmethod
+    def expired(cls, seconds):
+        """
+        Returns the finished and failed jobs last updated more than seconds ago
+        """
+        before = datetime.now() - timedelta(seconds=seconds)
+        rows = UsersDB.getInstance().query("SELECT * FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                                           (before,))
+        return [cls.fromDatabase(row) for row in rows]
+
+    @classmethod
+    def claimNext(cls):
+        """
+        Marks the oldest queued job as running and returns it, None if no job is queued. Abandoned running jobs
+        are queued again first.
+        The status update only succeeds for one process, so concurrent runners never claim the same job. Every claim
+        gets a new id, which the runner's saves are conditional on.
+        """
+        db = UsersDB.getInstance()
+        cls.requeueStale()
+        while True:
+            result = db.query("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1")
+            if len(result) == 0:
+                return None
+
+            job = cls.fromDatabase(result[0])
+            claim = uuid.uuid4().hex
+            claimed = db.command(
+                "UPDATE jobs SET status = 'running', claim = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (claim, datetime.now(), job.id))
+            if claimed == 1:
+                job.status = 'running'
+                job.claim = claim
+                return job
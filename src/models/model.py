@@ -95,7 +95,7 @@ class Model(object):
         expression = QueryExpression()
         expression.fromTable(cls.table_name())
         expression.where(key, '=', value)
-        result = db.query(expression.toSQL())
+        result = db.query(expression.toSQL(), expression.params())
 
         if (len(result) == 0):
             return None
@@ -116,7 +116,7 @@ class Model(object):
         expression = QueryExpression()
         expression.fromTable(cls.table_name())
         expression.where(key, '=', value)
-        result = db.query(expression.toSQL())
+        result = db.query(expression.toSQL(), expression.params())
 
         if (len(result) == 0):
             return []
@@ -135,7 +135,7 @@ class Model(object):
         for idx, key in enumerate(keys):
             expression.where(key, '=', values[idx])
 
-        result = db.query(expression.toSQL())
+        result = db.query(expression.toSQL(), expression.params())
 
         if (len(result) == 0):
             return None
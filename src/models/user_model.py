@@ -69,21 +69,31 @@ class UserModel(Model):
     def activate(self):
         self.status = 'active'
 
-    def logRequest(self):
-        if self.requests_made < self.requests_limit:
-            self.requests_made += 1
-
-        if self.last_request_datetime is None:
-            self.last_request_datetime = datetime.now()
-        else:
-            this_month = datetime.now().month
-            last_month = self.last_request_datetime.month
-
-            this_year = datetime.now().year
-            last_year = self.last_request_datetime.year
-
-            if this_month > last_month or this_year > last_year:
-                self.requests_made = 0
+    def requestsThisMonth(self, now=None):
+        """
+        Returns the number of requests made in the current month, the counter restarts every month
+        """
+        now = now or datetime.now()
+        if self.last_request_datetime is None or self.requests_made is None:
+            return 0
+
+        last = self.last_request_datetime
+        if (last.year, last.month) != (now.year, now.month):
+            return 0
+
+        return self.requests_made
+
+    def hasReachedLimit(self, now=None, count=1):
+        """
+        Returns whether count more requests would exceed the monthly limit
+        """
+        return self.requestsThisMonth(now) + count > int(self.requests_limit)
+
+    def logRequest(self, now=None, count=1):
+        now = now or datetime.now()
+        self.requests_made = min(self.requestsThisMonth(now) + count, int(self.requests_limit))
+
+        self.last_request_datetime = now
 
     @classmethod
     def getByUsername(cls, username):
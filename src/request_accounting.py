@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import atexit
+import threading
+from datetime import datetime
+
+from .db.users_db import UsersDB
+
+
+class RequestAccounting(object):
+    '''
+    Write-behind accounting of API requests. Requests are counted on the cached users, which are the view used to
+    enforce the limits, while the increments are kept per user and month and periodically added to the users table
+    in a single transaction. Increments are added rather than overwritten, so workers sharing the database do not
+    lose each other's requests. Every flush reads the counts of the users back, so the cached users see the requests
+    of the other workers. Close to the limit, requests are charged by a conditional update of the database instead,
+    so workers together do not pass it. A worker whose cached count is stale still counts from memory until it
+    reaches NEAR_LIMIT of the limit, so the limit can be passed by the requests the other workers count from memory
+    between two of their flushes.
+    This class is a singleton.
+    '''
+    _instance = None
+
+    # Seconds between two writes of the pending increments
+    FLUSH_INTERVAL = 5.0
+
+    # Pending increments are written early when this many users have requests pending
+    FLUSH_SIZE = 100
+
+    # Fraction of the monthly limit beyond which requests are charged in the database rather than in memory
+    NEAR_LIMIT = 0.9
+
+    # Months are compared on the 'YYYY-MM' prefix of the stored timestamps
+    DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+    MONTH_FORMAT = '%Y-%m'
+
+    FLUSH_SQL = '''
+        UPDATE users SET
+            requests_made = CASE
+                WHEN substr(last_request_datetime, 1, 7) = :month THEN MIN(requests_limit, requests_made + :count)
+                WHEN substr(last_request_datetime, 1, 7) > :month THEN requests_made
+                ELSE MIN(requests_limit, :count)
+            END,
+            last_request_datetime = CASE
+                WHEN last_request_datetime IS NULL OR last_request_datetime < :last THEN :last
+                ELSE last_request_datetime
+            END
+        WHERE id = :id
+    '''
+
+    CHARGE_SQL = '''
+        UPDATE users SET
+            requests_made = CASE
+                WHEN substr(last_request_datetime, 1, 7) = :month THEN requests_made + :count
+                ELSE :count
+            END,
+            last_request_datetime = :last
+        WHERE id = :id AND requests_limit >= :count + CASE
+            WHEN substr(last_request_datetime, 1, 7) = :month THEN requests_made
+            ELSE 0
+        END
+    '''
+
+    @staticmethod
+    def getInstance():
+        """
+        Returns the singleton accounting instance.
+        """
+        if RequestAccounting._instance is None:
+            RequestAccounting._instance = RequestAccounting()
+            atexit.register(RequestAccounting._instance.flush)
+
+        return RequestAccounting._instance
+
+    def __init__(self, near_limit=NEAR_LIMIT):
+        '''
+        @param near_limit: fraction of the monthly limit beyond which requests are charged in the database
+        @type near_limit: float
+        '''
+        self.near_limit = near_limit
+        self._lock = threading.RLock()
+        # (user id, 'YYYY-MM') -> [number of requests, last request datetime]
+        self._pending = {}
+        # user id -> cached user with pending requests, its counts are read back on flush
+        self._users = {}
+        self._pid = None
+
+    def logRequest(self, user, count=1):
+        """
+        Counts count requests of a user, returns False without counting them if they exceed the monthly limit
+        """
+        now = datetime.now()
+        with self._lock:
+            if user.hasReachedLimit(now, count):
+                return False
+            if user.requestsThisMonth(now) + count > self.near_limit * int(user.requests_limit):
+                return self._charge(user, now, count)
+
+            user.logRequest(now, count)
+            self._users[user.id] = user
+            key = (user.id, now.strftime(RequestAccounting.MONTH_FORMAT))
+            pending = self._pending.setdefault(key, [0, None])
+            pending[0] += count
+            pending[1] = now
+
+            self._startFlusher()
+            if len(self._pending) >= RequestAccounting.FLUSH_SIZE:
+                self.flush()
+
+        return True
+
+    def hasPending(self, user_id):
+        with self._lock:
+            return any(key[0] == user_id for key in self._pending)
+
+    def flush(self):
+        """
+        Adds the pending increments to the users table in a single transaction
+        """
+        with self._lock:
+            if not self._pending:
+                return
+
+            # Older months first, so a month is never counted after the counter moved on to the next one
+            params = [{'id': user_id,
+                       'month': month,
+                       'count': count,
+                       'last': last.strftime(RequestAccounting.DATETIME_FORMAT)}
+                      for (user_id, month), (count, last) in sorted(self._pending.iteritems(), key=lambda e: e[0][1])]
+            UsersDB.getInstance().commandMany(RequestAccounting.FLUSH_SQL, params)
+            self._pending.clear()
+            users = self._users.values()
+            self._users.clear()
+            self._refresh(users)
+
+    def _charge(self, user, now, count):
+        # The database holds the requests of all workers, the update only succeeds while they fit the limit
+        self.flush()
+        params = {'id': user.id,
+                  'month': now.strftime(RequestAccounting.MONTH_FORMAT),
+                  'count': count,
+                  'last': now.strftime(RequestAccounting.DATETIME_FORMAT)}
+        charged = UsersDB.getInstance().command(RequestAccounting.CHARGE_SQL, params) == 1
+        self._refresh([user])
+        return charged
+
+    def _refresh(self, users):
+        """
+        Reads the request counts of cached users back from the database
+        """
+        for user in users:
+            rows = UsersDB.getInstance().query("SELECT requests_made, last_request_datetime FROM users WHERE id = ?",
+                                               (user.id,))
+            if len(rows) > 0 and rows[0]['last_request_datetime'] is not None:
+                user.requests_made = rows[0]['requests_made']
+                user.last_request_datetime = datetime.strptime(rows[0]['last_request_datetime'],
+                                                               RequestAccounting.DATETIME_FORMAT)
+
+    def _startFlusher(self):
+        # Threads do not survive a fork, each worker process starts its own flusher
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        thread = threading.Thread(target=self._flushPeriodically, name='request-accounting')
+        thread.daemon = True
+        thread.start()
+
+    def _flushPeriodically(self):
+        while True:
+            time.sleep(RequestAccounting.FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                # The increments stay pending and are written by the next flush
+                pass
@@ -1,18 +1,23 @@
-from ..helpers import jsonify, TCF, jsonTCF, isset
-from lxml import etree
-from StringIO import StringIO
+from ..helpers import jsonify, TCF, TSV, JSONL, jsonTCF, jsonCompact, isset, generate_token
+from .. import tcf
 
 from flask import Blueprint
 from flask import request
 from flask import Response
+from flask import stream_with_context
 from flask import current_app
+from flask import g
 from functools import wraps
 from ..models.user_model import UserModel
-from ..models.auth_token_model import AuthTokenModel
-import re
+from ..models.job_model import JobModel
+from ..auth_cache import AuthCache
+from ..model_registry import ReleasingIterator
 import os
 import json
-import csv
+from datetime import datetime
+
+# Number of sentences of a streamed response archived together
+ARCHIVE_SENTENCES = 100
 
 
 class ServerError(Exception):
@@ -90,6 +95,31 @@ class InvalidUsage(Exception):
         return rv
 
 
+class NotFound(Exception):
+    """
+    Thrown during a 404 server error
+    """
+    status_code = 404
+
+    def __init__(self, message):
+        '''
+        @param message:
+        @type message: string
+        '''
+        Exception.__init__(self)
+        self.message = message
+
+    def to_dict(self):
+        '''
+
+        @return:
+        @rtype: string
+        '''
+        rv = dict()
+        rv['message'] = self.message
+        return rv
+
+
 class ApiRouter(Blueprint):
 
     def register(self, app, options, first_registration=False):
@@ -134,20 +164,19 @@ class ApiRouter(Blueprint):
                 if auth_token_string is None:
                     raise Unauthorized('Invalid token')
 
-                authToken = AuthTokenModel.getByAttributeSingle('token', auth_token_string)
-                if authToken is None or not authToken.isValid():
-                    raise Unauthorized('Invalid token')
-
-                # Log request
-                user = UserModel.getByPk(authToken.user_id)
+                # Validated tokens and their users are cached in-process
+                authCache = AuthCache.getInstance()
+                user = authCache.getUser(auth_token_string)
                 if user is None:
                     raise Unauthorized('Invalid token')
 
                 if user.status != 'active':
                     raise Unauthorized('User has no access')
 
-                user.logRequest()
-                user.save()
+                # Log request, the request counts are written in batches
+                if not authCache.logRequest(user):
+                    raise Unauthorized('Request limit reached')
+                g.user = user
                 return api_method(*args, **kwargs)
 
             return verify
@@ -155,64 +184,49 @@ class ApiRouter(Blueprint):
         def save_file(api_method):
             @wraps(api_method)
             def post_request(*args, **kwargs):
-                auth_token_string = request.cookies.get('auth-token')
-                if auth_token_string is None:
-                    auth_token_string = request.headers.get('Authorization')
-
-                if auth_token_string is None:
-                    raise Unauthorized('Invalid token')
-
-                authToken = AuthTokenModel.getByAttributeSingle('token', auth_token_string)
-                if authToken is None or not authToken.isValid():
+                # The token has already been validated by authenticate
+                if getattr(g, 'user', None) is None:
                     raise Unauthorized('Invalid token')
 
+                g.request_id = get_request_id(request)
+                g.received = datetime.now()
+                g.tagged = None
                 result = api_method(*args, **kwargs)
-                filePath = os.path.join(self.config['UPLOAD_FOLDER'], get_request_id(request))
 
-                raw = result.get_data()
-                try:
-                    data = json.loads(raw)
-                    csvResult = []
-                    posTags = {}
-                    lemmas = {}
-                    tokens = {}
-
-                    if 'POSTags' in data:
-                        for tag in data['POSTags']:
-                            posTags[tag['tokenIDs']] = tag
-
-                    if 'lemmas' in data:
-                        for lemma in data['lemmas']:
-                            lemmas[lemma['tokenIDs']] = lemma
-
-                    if 'tokens' in data:
-                        for token in data['tokens']:
-                            tokens[token['ID']] = token
-
-                    for sentence in data['sentences']:
-                        for tid in sentence['tokenIDs'].split(' '):
-                            csvResult.append([])
-                            token = tokens[tid]
-                            csvResult[-1].append(token['value'])
-                            if tid in posTags:
-                                csvResult[-1].append(posTags[tid]['value'])
-                            if tid in lemmas:
-                                csvResult[-1].append(lemmas[tid]['value'])
-                            csvResult[-1].append(token['startChar'] + ' - ' + token['endChar'])
-                        csvResult.append([])
-
-                    with open(filePath, 'w') as f:
-                        w = csv.writer(f, delimiter="\t")
-                        w.writerows(csvResult)
-
-                except:
-                    with open(filePath, 'w') as f:
-                        f.write(raw)
+                # The tagged sentences are archived in the background, streamed responses archive them while sent
+                if g.tagged is not None:
+                    dc['archiver'].archive(g.request_id, g.tagged, received=g.received, user_id=g.user.id)
 
                 return result
 
             return post_request
 
+        def archived(sentences):
+            '''
+            Passes the tagged sentences of a streamed response through, archiving them in parts
+
+            @param sentences: iterator of tagged sentences
+            @type sentences: iterator
+            @return: the same sentences
+            @rtype: iterator
+            '''
+            archiver = dc['archiver']
+            request_id = g.request_id
+            received = g.received
+            user_id = g.user.id
+            part = []
+            append = False
+            for sentence in sentences:
+                part.append(sentence)
+                if len(part) == ARCHIVE_SENTENCES:
+                    archiver.archive(request_id, part, append, received, user_id)
+                    part = []
+                    append = True
+                yield sentence
+
+            if part or not append:
+                archiver.archive(request_id, part, append, received, user_id)
+
         def get_format(request):
             params = request.form if request.method == 'POST' else request.args
             format = params.get('format')
@@ -239,32 +253,71 @@ class ApiRouter(Blueprint):
             print "get text"
             params = request.form if request.method == 'POST' else request.args
             files = request.files
-            if format == 'json':
+            if format in ('json', 'json-compact', 'jsonl', 'tsv'):
                 if 'file' in files:
                     return files['file'].read()
                 else:
                     return params.get('text')
             elif format == 'tcf':
-                with open('assets/tcfschema/d-spin-local_0_4.rng', 'r') as f:
-
-                    if 'file' in files:
-                        text = files['file'].read()
-                    else:
-                        text = params.get('text').encode('utf-8')
-                    relaxng_doc = etree.parse(f)
-                    relaxng = etree.RelaxNG(relaxng_doc)
-                    inputXml = re.sub(">\\s*<", "><", text)
-                    inputXml = re.sub("^\\s*<", "<", inputXml)
-
-                    doc = etree.parse(StringIO(inputXml))
-                    try:
-                        relaxng.assertValid(doc)
-                        return doc.getroot()[1][0].text
-                    except Exception as e:
-                        raise InvalidUsage(e.message)
+                if 'file' in files:
+                    # Parsed while it is read, the upload is never copied into a string
+                    source = files['file'].stream
+                else:
+                    source = params.get('text').encode('utf-8')
+                try:
+                    return tcf.text(source)
+                except ValueError as e:
+                    raise InvalidUsage(e.message)
             else:
                 raise InvalidUsage('Unknown format ' + format)
 
+        def get_documents(request):
+            '''
+            Reads the documents of a batch request, either from the "documents" parameter (a JSON array)
+            or from an uploaded JSONL file (one document per line). A document is either a string or
+            an object with a "text" and an optional "id" field.
+
+            @param request:
+            @type request: string
+            @return: list of (id, text) tuples
+            @rtype: list
+            '''
+            params = request.form if request.method == 'POST' else request.args
+            files = request.files
+            try:
+                if 'file' in files:
+                    documents = [json.loads(line) for line in files['file'].read().decode('utf-8').splitlines()
+                                 if line.strip() != '']
+                else:
+                    documents = json.loads(params.get('documents') or '[]')
+            except ValueError as e:
+                raise InvalidUsage('Invalid documents: ' + e.message)
+
+            if not isinstance(documents, list) or len(documents) == 0:
+                raise InvalidUsage('Please specify a non-empty list of documents')
+
+            result = []
+            for idx, document in enumerate(documents):
+                if isinstance(document, dict):
+                    document_id = document.get('id', idx)
+                    text = document.get('text')
+                else:
+                    document_id = idx
+                    text = document
+
+                if not isinstance(text, basestring):
+                    raise InvalidUsage('Document {0} has no text'.format(document_id))
+                result.append((document_id, text))
+
+            max_documents = self.config.get('BATCH_MAX_DOCUMENTS', 0)
+            if max_documents and len(result) > max_documents:
+                raise InvalidUsage('A batch may contain at most {0} documents'.format(max_documents))
+            max_chars = self.config.get('BATCH_MAX_CHARS', 0)
+            if max_chars and sum(len(text) for document_id, text in result) > max_chars:
+                raise InvalidUsage('A batch may contain at most {0} characters'.format(max_chars))
+
+            return result
+
         @self.route('/')
         def index():
             '''
@@ -306,16 +359,216 @@ class ApiRouter(Blueprint):
                 raise InvalidUsage('Please specify a format')
 
             text = get_text(format, request)
-            # tagger = dc['tagger.' + lang]
-            tagger = dc['ner_tagger.' + lang]
+            if lang not in dc['models']:
+                raise InvalidUsage('Unknown language ' + lang)
+
+            if format in ('jsonl', 'tsv'):
+                # Streamed sentence by sentence, the tagged document is never held in memory. The models are tagging
+                # after the view returns, so they stay leased until the response is closed.
+                writer = JSONL if format == 'jsonl' else TSV
+                mimetype = 'application/x-ndjson' if format == 'jsonl' else 'text/tab-separated-values'
+                components = dc['models'].acquire(lang)
+                try:
+                    sentences = archived(components['ner_tagger'].iter_tag(text))
+                    response = stream_with_context(writer(sentences, tag_idx=1, ner_idx=2))
+                except Exception:
+                    dc['models'].release(components)
+                    raise
+                return Response(ReleasingIterator(response, lambda: dc['models'].release(components)),
+                                mimetype=mimetype)
+
             print "2"
-            result = tagger.tag(text)
+            with dc['models'].lease(lang) as components:
+                result = components['ner_tagger'].tag(text)
             print "3"
+            g.tagged = result
             if format == 'json':
                 return jsonify(jsonTCF(lang, text, result, tag_idx=1), ensure_ascii=False)
+            elif format == 'json-compact':
+                return jsonify(jsonCompact(text, result, tag_idx=1, ner_idx=2), ensure_ascii=False, compact=True)
             elif format == 'tcf':
+                # Streamed while it is serialized
                 return Response(TCF(lang, text, result, tag_idx=1), mimetype='text/xml')
 
+        @self.route('/<lang>/tag/batch', methods=['POST'])
+        @authenticate
+        @save_file
+        def tag_batch(lang):
+            '''
+            Tags many documents in a single request, so authentication and archiving are only paid once per batch.
+            Every document counts as a request against the monthly limit.
+
+            @param lang:
+            @type lang: string
+            @return:
+            @rtype: string
+            '''
+
+            format = get_format(request)
+            if not isset(format):
+                raise InvalidUsage('Please specify a format')
+            if format not in ('json', 'json-compact'):
+                raise InvalidUsage('Batch requests only support the json and json-compact formats')
+
+            documents = get_documents(request)
+            if lang not in dc['models']:
+                raise InvalidUsage('Unknown language ' + lang)
+            # The first document was counted by authenticate
+            if len(documents) > 1 and not AuthCache.getInstance().logRequest(g.user, len(documents) - 1):
+                raise Unauthorized('Request limit reached')
+            with dc['models'].lease(lang) as components:
+                results = components['ner_tagger'].tag_many([text for document_id, text in documents])
+            g.tagged = [sentence for result in results for sentence in result]
+
+            output = []
+            for (document_id, text), result in zip(documents, results):
+                if format == 'json':
+                    document = jsonTCF(lang, text, result, tag_idx=1)
+                else:
+                    document = jsonCompact(text, result, tag_idx=1, ner_idx=2)
+                document['ID'] = document_id
+                output.append(document)
+
+            return jsonify(output, ensure_ascii=False, compact=format == 'json-compact')
+
+
+        def get_job(job_id):
+            job = JobModel.getByPk(job_id)
+            if job is None or job.user_id != g.user.id:
+                raise NotFound('Unknown job ' + str(job_id))
+
+            return job
+
+        @self.route('/<lang>/jobs', methods=['POST'])
+        @authenticate
+        def create_job(lang):
+            '''
+            Enqueues a document for tagging in the background and returns the job id
+
+            @param lang:
+            @type lang: string
+            @return:
+            @rtype: string
+            '''
+            format = get_format(request)
+            if format not in ('json', 'tcf', 'tsv'):
+                raise InvalidUsage('Please specify a format (json, tcf or tsv)')
+            if lang not in dc['models']:
+                raise InvalidUsage('Unknown language ' + lang)
+
+            jobs_folder = os.path.join(self.config['UPLOAD_FOLDER'], 'jobs')
+            if not os.path.exists(jobs_folder):
+                os.makedirs(jobs_folder)
+
+            name = generate_token()
+            input_path = os.path.join(jobs_folder, name + '.in')
+            if 'file' in request.files:
+                # Streamed to disk, the upload is never held in memory
+                request.files['file'].save(input_path)
+            else:
+                text = request.form.get('text')
+                if not isset(text):
+                    raise InvalidUsage('Please specify a text or a file')
+                with open(input_path, 'wb') as f:
+                    f.write(text.encode('utf-8'))
+
+            job = JobModel()
+            job.user_id = g.user.id
+            job.lang = lang
+            job.input_format = 'tcf' if format == 'tcf' else 'text'
+            job.format = format
+            job.status = 'queued'
+            job.sentences_done = 0
+            job.input_path = input_path
+            job.result_path = os.path.join(jobs_folder, name + '.out')
+            job.save()
+
+            dc['job_runner'].start()
+            return jsonify(job.toDict(), ensure_ascii=False, status=202)
+
+        @self.route('/jobs/<int:job_id>', methods=['GET'])
+        @authenticate
+        def job_status(job_id):
+            '''
+            Reports the status and the progress (in sentences) of a job
+
+            @param job_id:
+            @type job_id: int
+            @return:
+            @rtype: string
+            '''
+            return jsonify(get_job(job_id).toDict(), ensure_ascii=False)
+
+        @self.route('/jobs/<int:job_id>/result', methods=['GET'])
+        @authenticate
+        def job_result(job_id):
+            '''
+            Streams the result of a finished job
+
+            @param job_id:
+            @type job_id: int
+            @return:
+            @rtype: string
+            '''
+            job = get_job(job_id)
+            if job.isFailed():
+                raise InvalidUsage('Job failed: ' + str(job.error))
+            if not job.isDone():
+                raise InvalidUsage('Job is not finished yet')
+
+            def generate():
+                with open(job.result_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(65536), ''):
+                        yield chunk
+
+            mimetypes = {'json': 'application/json', 'tcf': 'text/xml', 'tsv': 'text/tab-separated-values'}
+            return Response(generate(), mimetype=mimetypes[job.format])
+
+        @self.route('/archive/<path:request_id>', methods=['GET'])
+        @authenticate
+        def archived_result(request_id):
+            '''
+            Returns an archived result of the user by its request id, as tsv (default) or jsonl
+
+            @param request_id:
+            @type request_id: string
+            @return:
+            @rtype: string
+            '''
+            format = get_format(request) or 'tsv'
+            if format not in ('tsv', 'jsonl'):
+                raise InvalidUsage('Please specify a format (tsv or jsonl)')
+
+            try:
+                sentences = dc['archiver'].read(request_id, g.user.id)
+            except ValueError as e:
+                raise InvalidUsage(e.message)
+            if sentences is None:
+                raise NotFound('Unknown request ' + request_id)
+
+            writer = JSONL if format == 'jsonl' else TSV
+            mimetype = 'application/x-ndjson' if format == 'jsonl' else 'text/tab-separated-values'
+            return Response(writer(sentences, tag_idx=1, ner_idx=2), mimetype=mimetype)
+
+        @self.route('/stats', methods=['GET'])
+        @authenticate
+        def stats():
+            '''
+            Reports the load time and memory of the language models and the cache metrics of the loaded taggers by
+            language, only for administrators
+
+            @return:
+            @rtype: string
+            '''
+            if g.user.role != 'admin':
+                raise Unauthorized('User has no access')
+
+            taggers = {}
+            for lang, components in dc['models'].loaded().items():
+                if hasattr(components['ner_tagger'], 'stats'):
+                    taggers[lang] = components['ner_tagger'].stats()
+
+            return jsonify({'models': dc['models'].stats(), 'taggers': taggers}, ensure_ascii=False)
 
         @self.route('/login', methods=['POST'])
         def login():
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import threading
+from lxml import etree
+
+SCHEMA_PATH = 'assets/tcfschema/d-spin-local_0_4.rng'
+TEXTCORPUS_NS = '{http://www.dspin.de/data/textcorpus}'
+
+# Bytes read from an upload stream at a time
+CHUNK_SIZE = 65536
+
+_schema = None
+_lock = threading.Lock()
+
+
+def schema():
+    """
+    Returns the D-Spin RelaxNG schema, compiled once per process
+    """
+    global _schema
+    with _lock:
+        if _schema is None:
+            _schema = etree.RelaxNG(etree.parse(SCHEMA_PATH))
+    return _schema
+
+
+def parse(source):
+    """
+    Parses a TCF document from a string or a file-like object, such as an upload stream, which is fed to the
+    parser in chunks. Whitespace between elements is dropped.
+    """
+    if isinstance(source, basestring):
+        chunks = [source]
+    else:
+        chunks = iter(lambda: source.read(CHUNK_SIZE), '')
+
+    parser = etree.XMLParser(remove_blank_text=True)
+    leading = True
+    for chunk in chunks:
+        if leading:
+            # Whitespace before the XML declaration is not well-formed
+            chunk = chunk.lstrip()
+            leading = chunk == ''
+        parser.feed(chunk)
+
+    return parser.close()
+
+
+def text(source):
+    """
+    Validates a TCF document against the D-Spin schema and returns its text, raises a ValueError if it is invalid
+    """
+    try:
+        root = parse(source)
+    except etree.XMLSyntaxError as e:
+        raise ValueError(e.message)
+
+    relaxng = schema()
+    # The validator keeps the errors of the last validation, so validations are not run concurrently
+    with _lock:
+        try:
+            relaxng.assertValid(root)
+        except etree.DocumentInvalid as e:
+            raise ValueError(e.message)
+
+    return root.findtext(TEXTCORPUS_NS + 'TextCorpus/' + TEXTCORPUS_NS + 'text')
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from flask import Flask
+
+from src.di import DependencyContainer
+from src.db.users_db import UsersDB
+from src.models.user_model import UserModel
+from src.model_registry import ModelRegistry
+from src.auth_cache import AuthCache
+from src.routers.api_router import ApiRouter
+from src.core.sentence import Sentence
+from src.helpers import jsonify
+
+
+class Tagger(object):
+
+    def tag(self, text, vert=False):
+        tokens = []
+        offset = 0
+        for word in text.split():
+            start = text.index(word, offset)
+            offset = start + len(word)
+            tokens.append((word, start, offset - 1))
+        sentence = Sentence.fromTokens(tokens)
+        sentence.msds = tuple('Ncmsn' for token in tokens)
+        sentence.ners = tuple('O' for token in tokens)
+        return [sentence]
+
+    def tag_many(self, texts):
+        return [self.tag(text) for text in texts]
+
+
+class Archiver(object):
+
+    def archive(self, *args, **kwargs):
+        pass
+
+
+class BatchRoutesTests(unittest.TestCase):
+
+    def setUp(self):
+        # Requests counted by earlier tests are written before the database is reset
+        AuthCache.getInstance().invalidate()
+        UsersDB.getInstance().reset()
+        user = UserModel()
+        user.username = 'user1'
+        user.email = 'user1@user.com'
+        user.setPassword('000000')
+        user.project = 'ReLDI'
+        user.requests_limit = 5
+        user.requests_made = 0
+        user.status = 'active'
+        user.role = 'user'
+        user.save()
+        token = UserModel.getByUsername('user1').generateToken('000000')
+        token.save()
+        self.headers = {'Authorization': token.token}
+
+        app = Flask(__name__)
+        app.config['BATCH_MAX_DOCUMENTS'] = 3
+        app.config['BATCH_MAX_CHARS'] = 100
+        dc = DependencyContainer()
+        models = ModelRegistry(['sl'], lambda lang: {'segmenter': None, 'ner_tagger': Tagger()})
+        dc['models'] = lambda: models
+        dc['archiver'] = lambda: Archiver()
+        app.register_blueprint(ApiRouter(dc), url_prefix='/api/v1')
+
+        @app.errorhandler(Exception)
+        def handle_error(error):
+            return jsonify(error.message), getattr(error, 'status_code', 500)
+
+        self.client = app.test_client()
+
+    def post(self, documents):
+        if not isinstance(documents, basestring):
+            documents = json.dumps(documents)
+        data = {'format': 'json-compact', 'request-id': 'batch', 'documents': documents}
+        return self.client.post('/api/v1/sl/tag/batch', data=data, headers=self.headers)
+
+    def requests_made(self):
+        AuthCache.getInstance().flush()
+        return UserModel.getByUsername('user1').requests_made
+
+    def test_tags_documents_in_order(self):
+        response = self.post([u'Ena dva', {'id': 'b', 'text': u'Tri'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([document['ID'] for document in json.loads(response.data)], [0, 'b'])
+
+    def test_malformed_documents(self):
+        for documents in ('[', '{}', '[]', [{'id': 'a'}]):
+            self.assertEqual(self.post(documents).status_code, 422)
+
+    def test_batch_size_limits(self):
+        self.assertEqual(self.post([u'a', u'b', u'c', u'd']).status_code, 422)
+        self.assertEqual(self.post([u'a' * 60, u'b' * 60]).status_code, 422)
+
+    def test_every_document_counts_against_the_limit(self):
+        self.assertEqual(self.post([u'a', u'b', u'c']).status_code, 200)
+        self.assertEqual(self.requests_made(), 3)
+
+        # The request itself is counted on authentication, its other documents would pass the limit
+        self.assertEqual(self.post([u'a', u'b', u'c']).status_code, 401)
+        self.assertEqual(self.requests_made(), 4)
+        self.assertEqual(self.post([u'a']).status_code, 200)
+        self.assertEqual(self.requests_made(), 5)
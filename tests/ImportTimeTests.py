@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the runtime modules in a fresh interpreter and reports the time and the side effects of the imports
+SCRIPT = '''
+import sys
+import json
+import time
+import signal
+stdout = sys.stdout
+sigpipe = signal.getsignal(signal.SIGPIPE)
+start = time.time()
+import src.core.segmenter, src.core.tagger, src.core.ner_tagger, src.core.lematiser, src.core.loading
+seconds = time.time() - start
+json.dump({
+    'seconds': seconds,
+    'modules': sorted(name for name, module in sys.modules.items() if module is not None),
+    'stdout': sys.stdout is stdout,
+    'sigpipe': signal.getsignal(signal.SIGPIPE) == sigpipe
+}, stdout)
+'''
+
+
+class ImportTimeTests(unittest.TestCase):
+
+    # Seconds the runtime modules may take to import, several times their import time on a laptop
+    BUDGET = 1.0
+
+    # Modules only needed for training or by features which import them on first use
+    LAZY_MODULES = ['numpy', 'sklearn', 'scipy', 'train_tagger', 'train_ner_tagger', 'train_lemmatiser']
+
+    @classmethod
+    def setUpClass(cls):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT], cwd=ROOT)
+        cls.result = json.loads(output)
+
+    def test_import_time_budget(self):
+        self.assertLess(self.result['seconds'], ImportTimeTests.BUDGET)
+
+    def test_heavy_modules_are_not_imported(self):
+        for module in ImportTimeTests.LAZY_MODULES:
+            # Packages by their top level name, the training scripts also by their name inside src.core
+            imported = [name for name in self.result['modules']
+                        if name == module or name.startswith(module + '.') or name.endswith('.' + module)]
+            self.assertEqual(imported, [])
+
+    def test_no_process_wide_side_effects(self):
+        self.assertTrue(self.result['stdout'])
+        self.assertTrue(self.result['sigpipe'])
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from src.di import DependencyContainer
+from src.db.users_db import UsersDB
+from src.models.user_model import UserModel
+from src.models.job_model import JobModel, ClaimLost
+from src.model_registry import ModelRegistry
+from src.job_runner import JobRunner
+from src.routers.api_router import ApiRouter
+from src.core.sentence import Sentence
+from src.helpers import jsonify
+
+
+class Segmenter(object):
+
+    def iter_segment(self, text):
+        offset = 0
+        for sentence in text.split(u'.'):
+            tokens = []
+            for word in sentence.split():
+                start = text.index(word, offset)
+                offset = start + len(word)
+                tokens.append((word, start, offset - 1))
+            if tokens:
+                yield tokens
+
+
+class Tagger(object):
+
+    def tag(self, sentences, vert=False):
+        tagged = []
+        for tokens in sentences:
+            sentence = Sentence.fromTokens(tokens)
+            sentence.msds = tuple('Ncmsn' for token in tokens)
+            sentence.ners = tuple('O' for token in tokens)
+            tagged.append(sentence)
+        return tagged
+
+
+def new_job(user_id=1, status='queued'):
+    job = JobModel()
+    job.user_id = user_id
+    job.lang = 'sl'
+    job.input_format = 'text'
+    job.format = 'tsv'
+    job.status = status
+    job.sentences_done = 0
+    job.input_path = ''
+    job.result_path = ''
+    job.save()
+    return job
+
+
+class JobModelTests(unittest.TestCase):
+
+    def setUp(self):
+        UsersDB.getInstance().reset()
+
+    def test_claims_oldest_queued_job_once(self):
+        first = new_job()
+        new_job()
+
+        claimed = JobModel.claimNext()
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertEqual(JobModel.getByPk(first.id).status, 'running')
+        self.assertNotEqual(JobModel.claimNext().id, first.id)
+        self.assertIsNone(JobModel.claimNext())
+
+    def test_requeues_stale_running_jobs(self):
+        job = new_job(status='running')
+        self.assertIsNone(JobModel.claimNext())
+
+        UsersDB.getInstance().command("UPDATE jobs SET updated = ? WHERE id = ?",
+                                      (datetime.now() - timedelta(seconds=JobModel.STALE_SECONDS + 1), job.id))
+        self.assertEqual(JobModel.claimNext().id, job.id)
+
+    def test_stalled_runner_loses_its_claim(self):
+        new_job()
+        stalled = JobModel.claimNext()
+        stalled.heartbeat()
+        UsersDB.getInstance().command("UPDATE jobs SET updated = ? WHERE id = ?",
+                                      (datetime.now() - timedelta(seconds=JobModel.STALE_SECONDS + 1), stalled.id))
+        claimed = JobModel.claimNext()
+        self.assertEqual(claimed.id, stalled.id)
+
+        self.assertRaises(ClaimLost, stalled.heartbeat)
+        self.assertRaises(ClaimLost, stalled.progress, 1)
+        self.assertRaises(ClaimLost, stalled.finish)
+        claimed.fail('error')
+        self.assertEqual(JobModel.getByPk(claimed.id).status, 'failed')
+
+
+class JobRoutesTests(unittest.TestCase):
+
+    def setUp(self):
+        UsersDB.getInstance().reset()
+        user = UserModel()
+        user.username = 'user1'
+        user.email = 'user1@user.com'
+        user.setPassword('000000')
+        user.project = 'ReLDI'
+        user.requests_limit = 1000
+        user.requests_made = 0
+        user.status = 'active'
+        user.role = 'user'
+        user.save()
+        token = UserModel.getByUsername('user1').generateToken('000000')
+        token.save()
+        self.headers = {'Authorization': token.token}
+
+        self.folder = tempfile.mkdtemp()
+        app = Flask(__name__)
+        app.config['UPLOAD_FOLDER'] = self.folder
+        dc = DependencyContainer()
+        models = ModelRegistry(['sl'], lambda lang: {'segmenter': Segmenter(), 'ner_tagger': Tagger()})
+        dc['models'] = lambda: models
+        # Without worker threads, the jobs are run by the test
+        self.runner = JobRunner(dc, 0, chunk_sentences=2)
+        dc['job_runner'] = lambda: self.runner
+        app.register_blueprint(ApiRouter(dc), url_prefix='/api/v1')
+
+        @app.errorhandler(Exception)
+        def handle_error(error):
+            return jsonify(error.message), getattr(error, 'status_code', 500)
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_job_lifecycle(self):
+        response = self.client.post('/api/v1/sl/jobs', data={'format': 'tsv', 'text': u'Ena dva. Tri. Štiri pet.'},
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['id']
+
+        response = self.client.get('/api/v1/jobs/{0}/result'.format(job_id), headers=self.headers)
+        self.assertEqual(response.status_code, 422)
+
+        self.runner.run(JobModel.claimNext())
+        status = json.loads(self.client.get('/api/v1/jobs/{0}'.format(job_id), headers=self.headers).data)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['sentences_total'], 3)
+        self.assertEqual(status['sentences_done'], 3)
+
+        response = self.client.get('/api/v1/jobs/{0}/result'.format(job_id), headers=self.headers)
+        lines = response.data.decode('utf-8').split(u'\n')
+        self.assertEqual(lines[0].split(u'\t')[0], u'Ena')
+        self.assertIn(u'Štiri\tNcmsn\tO', u'\n'.join(lines))
+
+    def test_stalled_runner_leaves_the_job_to_the_new_claim(self):
+        response = self.client.post('/api/v1/sl/jobs', data={'format': 'tsv', 'text': u'Ena dva.'},
+                                    headers=self.headers)
+        job_id = json.loads(response.data)['id']
+        stalled = JobModel.claimNext()
+        UsersDB.getInstance().command("UPDATE jobs SET status = 'queued', claim = NULL WHERE id = ?", (job_id,))
+        claimed = JobModel.claimNext()
+
+        self.runner.run(stalled)
+        self.assertEqual(JobModel.getByPk(job_id).status, 'running')
+        self.assertFalse(os.path.exists(stalled.result_path))
+        self.runner.run(claimed)
+        self.assertEqual(JobModel.getByPk(job_id).status, 'done')
+        self.assertEqual(os.listdir(os.path.dirname(claimed.result_path)), [os.path.basename(claimed.result_path)])
+
+    def test_removes_expired_jobs_and_their_files(self):
+        response = self.client.post('/api/v1/sl/jobs', data={'format': 'tsv', 'text': u'Ena dva.'},
+                                    headers=self.headers)
+        job_id = json.loads(response.data)['id']
+        job = JobModel.claimNext()
+        self.runner.run(job)
+
+        self.runner.removeExpired()
+        self.assertTrue(os.path.exists(job.result_path))
+        UsersDB.getInstance().command("UPDATE jobs SET updated = ? WHERE id = ?",
+                                      (datetime.now() - timedelta(seconds=JobRunner.RETENTION + 1), job_id))
+        self.runner.removeExpired()
+        self.assertFalse(os.path.exists(job.result_path))
+        self.assertEqual(self.client.get('/api/v1/jobs/{0}'.format(job_id), headers=self.headers).status_code, 404)
+
+    def test_unknown_job(self):
+        response = self.client.get('/api/v1/jobs/999', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+from src.core.lru import LRUCache
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_stats(self):
+        cache = LRUCache(10)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('x')
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_evicts_by_size(self):
+        cache = LRUCache(10, maxbytes=10)
+        cache.put('a', 'xxxx')
+        cache.put('b', 'yyyy')
+        cache.put('c', 'zzzz')
+
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.bytes, 8)
+
+        cache.put('d', 'w' * 11)
+        self.assertNotIn('d', cache)
+        cache.put('b', 'y')
+        self.assertEqual(cache.bytes, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+    def test_concurrent_puts_keep_the_bound(self):
+        cache = LRUCache(100, maxbytes=1000)
+
+        def fill(offset):
+            for idx in range(5000):
+                cache.put(offset + idx, 'xx')
+                cache.get(offset + idx - 50)
+
+        threads = [threading.Thread(target=fill, args=(n * 10000,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(cache), 100)
+        self.assertEqual(cache.bytes, 200)
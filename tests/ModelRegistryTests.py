@@ -0,0 +1,91 @@
+import time
+import threading
+import unittest
+
+from src.model_registry import ModelRegistry
+
+
+class Model(object):
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ModelRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = []
+
+    def loader(self, size=0, delay=0):
+        def load(lang):
+            self.loads.append(lang)
+            time.sleep(delay)
+            return {'ner_tagger': Model(lang), 'model_bytes': size}
+        return load
+
+    def test_loads_on_first_use(self):
+        registry = ModelRegistry(['hr', 'sl'], self.loader())
+        self.assertEqual(self.loads, [])
+
+        self.assertEqual(registry.get('sl').lang, 'sl')
+        self.assertIs(registry.get('sl'), registry.get('sl'))
+        self.assertEqual(self.loads, ['sl'])
+        self.assertNotIn('sr', registry)
+        self.assertRaises(KeyError, registry.get, 'sr')
+
+        stats = registry.stats()['languages']
+        self.assertTrue(stats['sl']['loaded'])
+        self.assertEqual(stats['sl']['loads'], 1)
+        self.assertIsNotNone(stats['sl']['load_seconds'])
+        self.assertFalse(stats['hr']['loaded'])
+
+    def test_records_load_phases(self):
+        registry = ModelRegistry(['sl'], lambda lang: {'ner_tagger': Model(lang), 'phases': {'tokenizer': 0.5}})
+        self.assertEqual(registry.stats()['languages']['sl']['phases'], {})
+
+        registry.get('sl')
+        self.assertEqual(registry.stats()['languages']['sl']['phases'], {'tokenizer': 0.5})
+
+    def test_concurrent_requests_load_once(self):
+        registry = ModelRegistry(['sl'], self.loader(delay=0.1))
+        threads = [threading.Thread(target=registry.get, args=('sl',)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.loads, ['sl'])
+
+    def test_evicts_least_recently_used_language(self):
+        size = 1000
+        registry = ModelRegistry(['hr', 'sl', 'sr'], self.loader(size), max_bytes=int(size * 2.5))
+        hr = registry.get('hr')
+        registry.get('sl')
+        registry.get('hr')
+        sl = registry.get('sl')
+        registry.get('sr')
+
+        self.assertEqual(registry.loaded().keys(), ['sl', 'sr'])
+        self.assertEqual(registry.stats()['languages']['hr']['evictions'], 1)
+        time.sleep(0.1)
+        self.assertTrue(hr.closed)
+        self.assertFalse(sl.closed)
+
+    def test_leased_components_are_closed_on_release(self):
+        size = 1000
+        registry = ModelRegistry(['hr', 'sl'], self.loader(size), max_bytes=int(size * 1.5))
+        with registry.lease('hr') as components:
+            hr = components['ner_tagger']
+            registry.get('sl')
+            self.assertEqual(registry.loaded().keys(), ['sl'])
+            time.sleep(0.1)
+            self.assertFalse(hr.closed)
+            self.assertEqual(registry.stats()['leases'], 1)
+
+        time.sleep(0.1)
+        self.assertTrue(hr.closed)
+        self.assertEqual(registry.stats()['leases'], 0)
@@ -0,0 +1,30 @@
+import unittest
+
+from src.db.query_expression import QueryExpression
+
+
+class QueryExpressionTests(unittest.TestCase):
+
+    def test_values_are_bound(self):
+        expression = QueryExpression().fromTable('auth_tokens').where('token', '=', "x' OR '1'='1")
+
+        self.assertEqual(expression.toSQL(), 'SELECT * FROM auth_tokens WHERE token = ?')
+        self.assertEqual(expression.params(), ("x' OR '1'='1",))
+
+    def test_same_text_for_different_values(self):
+        first = QueryExpression().fromTable('users').where('id', '=', 1).where('status', '=', 'active')
+        second = QueryExpression().fromTable('users').where('id', '=', 2).where('status', '=', 'blocked')
+
+        self.assertEqual(first.toSQL(), second.toSQL())
+        self.assertEqual(first.toSQL(), 'SELECT * FROM users WHERE id = ? AND status = ?')
+        self.assertEqual(second.params(), (2, 'blocked'))
+
+    def test_select(self):
+        expression = QueryExpression().select(['id', 'token']).fromTable('auth_tokens')
+
+        self.assertEqual(expression.toSQL(), 'SELECT id, token FROM auth_tokens')
+        self.assertEqual(expression.params(), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
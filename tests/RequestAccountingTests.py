@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime
+
+from src.db.users_db import UsersDB
+from src.models.user_model import UserModel
+from src.request_accounting import RequestAccounting
+
+
+class RequestAccountingTests(unittest.TestCase):
+
+    def setUp(self):
+        UsersDB.getInstance().reset()
+        user = UserModel()
+        user.username = 'test'
+        user.email = 'test@test.si'
+        user.setPassword('test')
+        user.role = 'user'
+        user.status = 'active'
+        user.requests_limit = 3
+        user.requests_made = 0
+        user.save()
+
+    def load(self):
+        return UserModel.getByUsername('test')
+
+    def test_increments_are_added(self):
+        accounting = RequestAccounting()
+        first = self.load()
+        second = self.load()
+
+        self.assertTrue(accounting.logRequest(first))
+        self.assertTrue(accounting.logRequest(second))
+        accounting.flush()
+        self.assertEqual(self.load().requests_made, 2)
+
+    def test_limit_enforced_from_memory(self):
+        # Never charged in the database
+        accounting = RequestAccounting(near_limit=1.0)
+        user = self.load()
+        for i in range(3):
+            self.assertTrue(accounting.logRequest(user))
+
+        self.assertFalse(accounting.logRequest(user))
+        self.assertEqual(self.load().requests_made, 0)
+        accounting.flush()
+        self.assertEqual(self.load().requests_made, 3)
+
+    def test_counts_several_requests_at_once(self):
+        accounting = RequestAccounting()
+        user = self.load()
+        self.assertFalse(accounting.logRequest(user, 4))
+        self.assertTrue(accounting.logRequest(user, 2))
+        self.assertFalse(accounting.logRequest(user, 2))
+        accounting.flush()
+        self.assertEqual(self.load().requests_made, 2)
+
+    def test_workers_do_not_pass_the_limit_together(self):
+        # Every request is close to the limit, two workers with their own cached user
+        first = RequestAccounting(near_limit=0.0)
+        second = RequestAccounting(near_limit=0.0)
+        first_user = self.load()
+        second_user = self.load()
+
+        accepted = [first.logRequest(first_user), second.logRequest(second_user), first.logRequest(first_user),
+                    second.logRequest(second_user), first.logRequest(first_user)]
+        self.assertEqual(accepted, [True, True, True, False, False])
+        self.assertEqual(self.load().requests_made, 3)
+
+    def test_flush_reads_the_requests_of_other_workers(self):
+        first = RequestAccounting()
+        second = RequestAccounting()
+        first_user = self.load()
+        second_user = self.load()
+
+        self.assertTrue(first.logRequest(first_user))
+        first.flush()
+        self.assertTrue(second.logRequest(second_user))
+        second.flush()
+        self.assertEqual(second_user.requestsThisMonth(), 2)
+
+        # Close to the limit the requests are checked against the database, not the stale count of the first worker
+        self.assertFalse(first.logRequest(first_user, 2))
+        self.assertEqual(first_user.requestsThisMonth(), 2)
+        self.assertTrue(first.logRequest(first_user))
+        self.assertFalse(second.logRequest(second_user))
+        self.assertEqual(self.load().requests_made, 3)
+
+    def test_monthly_reset(self):
+        user = self.load()
+        user.requests_made = 3
+        user.last_request_datetime = datetime(2000, 1, 31, 12, 0, 0, 1)
+        user.save()
+
+        accounting = RequestAccounting()
+        user = self.load()
+        self.assertTrue(accounting.logRequest(user))
+        accounting.flush()
+
+        user = self.load()
+        self.assertEqual(user.requests_made, 1)
+        self.assertEqual(user.last_request_datetime.month, datetime.now().month)
+
+    def test_previous_month_not_counted_after_reset(self):
+        accounting = RequestAccounting()
+        accounting._pending[(self.load().id, '2000-01')] = [2, datetime(2000, 1, 31, 12, 0, 0, 1)]
+        accounting.flush()
+        self.assertEqual(self.load().requests_made, 2)
+
+        user = self.load()
+        user.last_request_datetime = datetime(2000, 2, 1, 12, 0, 0, 1)
+        user.requests_made = 1
+        user.save()
+
+        accounting._pending[(user.id, '2000-01')] = [2, datetime(2000, 1, 31, 12, 0, 0, 1)]
+        accounting.flush()
+        user = self.load()
+        self.assertEqual(user.requests_made, 1)
+        self.assertEqual(user.last_request_datetime, datetime(2000, 2, 1, 12, 0, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.core.result_cache import ResultCache, CachingTagger
+from src.core.sentence import Sentence
+
+
+class Tagger(object):
+
+    def iter_tag(self, text, vert=False):
+        offset = 0
+        for word in text.split():
+            sentence = Sentence.fromTokens([(word, offset, offset + len(word) - 1)])
+            sentence.msds = ('Ncmsn',)
+            sentence.ners = ('O',)
+            offset += len(word) + 1
+            yield sentence
+
+
+class ResultCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache(4096)
+        self.tagger = CachingTagger(Tagger(), 'sl', 'version', self.cache)
+
+    def test_caches_streamed_document(self):
+        text = u'ena dva tri'
+        self.assertEqual([sentence.tokens for sentence in self.tagger.iter_tag(text)], [[u'ena'], [u'dva'], [u'tri']])
+        self.assertIn(self.tagger.key(text), self.cache.memory)
+
+        tokens = [sentence.tokens for sentence in self.tagger.iter_tag(text)]
+        self.assertEqual(tokens, [[u'ena'], [u'dva'], [u'tri']])
+        self.assertEqual(self.cache.stats()['memory']['hits'], 1)
+
+    def test_large_streamed_document_is_not_kept(self):
+        text = u' '.join(u'beseda{0}'.format(i) for i in range(10000))
+        sentences = self.tagger.iter_tag(text)
+        for i in range(1000):
+            next(sentences)
+        # The collected columns are dropped once they outgrow the memory tier
+        self.assertIsNone(sentences.gi_frame.f_locals['packed'])
+
+        self.assertEqual(len(list(sentences)), 9000)
+        self.assertNotIn(self.tagger.key(text), self.cache.memory)
+        self.assertEqual(self.cache.memory.bytes, 0)
+
+    def test_new_model_version_drops_old_results(self):
+        folder = tempfile.mkdtemp()
+        try:
+            cache = ResultCache(4096, os.path.join(folder, 'cache.db'))
+            cache.setVersion('sl', 'old')
+            cache.setVersion('hr', 'hr')
+            cache.put('a', 'old', 'sl result')
+            cache.put('b', 'hr', 'hr result')
+
+            # A restarted process loading changed models of a language
+            cache = ResultCache(4096, os.path.join(folder, 'cache.db'))
+            cache.setVersion('sl', 'new')
+            cache.setVersion('hr', 'hr')
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), 'hr result')
+        finally:
+            shutil.rmtree(folder)
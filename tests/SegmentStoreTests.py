@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from src.archiver import SegmentStore
+from src.core.sentence import Sentence
+
+
+class SegmentStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.sentences = [Sentence.fromRows([[u'Žiga', 1, 4, 'Npmsn', 'B-per'], [u'spi', 6, 8, 'Vmpr3s', 'O']])]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def segments(self):
+        return [name for name in os.listdir(self.folder) if name.endswith('.jsonl.gz')]
+
+    def test_parts_are_read_in_order(self):
+        store = SegmentStore(self.folder)
+        store.write('r1', self.sentences, False, datetime.now(), 1)
+        store.write('r1', [Sentence.fromRows([[u'.', 9, 9, 'Z', 'O']])], True, datetime.now(), 1)
+        store.sync()
+
+        sentences = store.read('r1', 1)
+        self.assertEqual(sentences[0], self.sentences[0])
+        self.assertEqual(sentences[1], [((u'.', 9, 9), 'Z', 'O')])
+        self.assertIsNone(store.read('r1', 2))
+        self.assertIsNone(store.read('r2', 1))
+
+    def test_rewrite_replaces_result(self):
+        store = SegmentStore(self.folder)
+        store.write('r1', self.sentences, False, datetime.now(), 1)
+        store.sync()
+        store.write('r1', [], False, datetime.now(), 1)
+        store.sync()
+
+        self.assertEqual(store.read('r1', 1), [])
+
+    def test_retention_removes_old_segments(self):
+        store = SegmentStore(self.folder, max_age=3600)
+        store.write('r1', self.sentences, False, datetime.now(), 1)
+        store.sync()
+
+        old = os.path.join(self.folder, '2000010100-1.jsonl.gz')
+        shutil.copy(os.path.join(self.folder, self.segments()[0]), old)
+        os.utime(old, (0, 0))
+        store.enforceRetention()
+
+        self.assertNotIn('2000010100-1.jsonl.gz', self.segments())
+        self.assertEqual(len(self.segments()), 1)
+        self.assertEqual(store.read('r1', 1), self.sentences)
+
+    def test_retention_keeps_open_segments(self):
+        store = SegmentStore(self.folder)
+        store.write('r1', self.sentences, False, datetime.now(), 1)
+        store.sync()
+
+        current = self.segments()[0]
+        size = os.path.getsize(os.path.join(self.folder, current))
+        # Closed segments of earlier hours and the open segment of another process
+        for idx, name in enumerate(['2000010100-1.jsonl.gz', '2000010101-1.jsonl.gz',
+                                    datetime.now().strftime('%Y%m%d%H') + '-0.jsonl.gz']):
+            shutil.copy(os.path.join(self.folder, current), os.path.join(self.folder, name))
+            os.utime(os.path.join(self.folder, name), (idx + 1, idx + 1))
+        store.max_bytes = size
+        store.enforceRetention()
+
+        self.assertNotIn('2000010100-1.jsonl.gz', self.segments())
+        self.assertEqual(len(self.segments()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
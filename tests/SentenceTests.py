@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pickle
+import marshal
+import unittest
+
+from src.core.sentence import Sentence
+
+
+class SentenceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sentence = Sentence.fromTokens([(u'Žiga', 0, 4), (u'spi', 5, 8)], 1)
+
+    def test_indexing_returns_token_tuples(self):
+        self.assertEqual(list(self.sentence), [((u'Žiga', 1, 4),), ((u'spi', 6, 8),)])
+
+        self.sentence.msds = ('Npmsn', 'Vmpr3s')
+        self.assertEqual(self.sentence[1], ((u'spi', 6, 8), 'Vmpr3s'))
+
+        self.sentence.ners = ('B-per', 'O')
+        self.assertEqual(self.sentence[0], ((u'Žiga', 1, 4), 'Npmsn', 'B-per'))
+        self.assertEqual(self.sentence.column(2), ('B-per', 'O'))
+        self.assertEqual(len(self.sentence), 2)
+
+    def test_missing_column(self):
+        self.assertRaises(IndexError, self.sentence.column, 1)
+        self.assertEqual(Sentence.fromTokens([]).column(1), ())
+
+    def test_serialization_keeps_columns(self):
+        self.sentence.msds = ('Npmsn', 'Vmpr3s')
+        self.sentence.ners = ('B-per', 'O')
+
+        packed = marshal.loads(marshal.dumps(self.sentence.pack(), 2))
+        self.assertEqual(Sentence.unpack(packed), self.sentence)
+        self.assertEqual(pickle.loads(pickle.dumps(self.sentence, 2)), self.sentence)
+        self.assertEqual(Sentence.fromRows(self.sentence.rows()), self.sentence)
@@ -0,0 +1,47 @@
+import unittest
+
+from src.core.engine import TaggingEngine
+from src.core.lru import LRUCache
+
+
+class Tagger(object):
+
+    def __init__(self):
+        self.sentence_cache = LRUCache(100)
+
+    def tag(self, sentences, vert=False):
+        tagged = []
+        for sentence in sentences:
+            upper = self.sentence_cache.get(sentence)
+            if upper is None:
+                upper = sentence.upper()
+                self.sentence_cache.put(sentence, upper)
+            tagged.append(upper)
+        return tagged
+
+    def stats(self):
+        return {'sentence_cache': {'ner': self.sentence_cache.stats()}}
+
+
+class TaggingEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = TaggingEngine('sl', None, 2, chunk_sentences=2, ner_tagger=Tagger())
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_tags_in_workers(self):
+        self.assertEqual(self.engine.tag(['a', 'b', 'c'], vert=True), ['A', 'B', 'C'])
+        self.assertEqual(list(self.engine.iter_tag(['a', 'b', 'c'], vert=True)), ['A', 'B', 'C'])
+
+    def test_collects_cache_counters_of_the_workers(self):
+        self.assertEqual(self.engine.stats(), {'workers': 0})
+        self.engine.tag(['a', 'b', 'c', 'd'], vert=True)
+        self.engine.tag(['a', 'b', 'c', 'd'], vert=True)
+
+        stats = self.engine.stats()
+        cache = stats['sentence_cache']['ner']
+        self.assertGreaterEqual(stats['workers'], 1)
+        self.assertEqual(cache['hits'] + cache['misses'], 8)
+        self.assertEqual(cache['hit_ratio'], cache['hits'] / 8.0)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+
+from cleo import Command, InputArgument, InputOption
+from src.db.janes_ner_db import dict_factory
+from src.db.query_expression import QueryExpression
+from src.helpers import generate_token
+
+
+class AuthLookupBenchmark(Command):
+
+    name = 'benchmark:auth-lookup'
+
+    description = 'Measures the latency of token lookups with string formatted and with bound queries'
+
+    options = [
+        {
+            'name': 'tokens',
+            'description': 'Number of tokens in the table',
+            'value_required': True,
+            'default': 100000
+        },
+        {
+            'name': 'lookups',
+            'description': 'Number of measured lookups',
+            'value_required': True,
+            'default': 2000
+        }
+    ]
+
+    def __init__(self):
+        super(AuthLookupBenchmark, self).__init__()
+
+    def execute(self, i, o):
+        """
+        Executes the command.
+
+        :type i: cleo.inputs.input.Input
+        :type o: cleo.outputs.output.Output
+        """
+
+        tokens = int(i.get_option('tokens'))
+        lookups = int(i.get_option('lookups'))
+
+        # A scratch database, the users database is never touched
+        folder = tempfile.mkdtemp()
+        try:
+            connection = sqlite3.connect(os.path.join(folder, 'users'), isolation_level=None)
+            connection.text_factory = str
+            connection.row_factory = dict_factory
+            connection.execute("""
+                CREATE TABLE auth_tokens (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    token TEXT,
+                    expiration_timestamp TEXT,
+                    updated TEXT NOT NULL,
+                    created TEXT NOT NULL,
+                    UNIQUE(user_id, token)
+                );
+            """)
+
+            values = [(idx % 1000, generate_token(), '', '') for idx in range(tokens)]
+            connection.execute('BEGIN')
+            connection.executemany("INSERT INTO auth_tokens (user_id, token, updated, created) VALUES (?, ?, ?, ?)",
+                                   values)
+            connection.execute('COMMIT')
+            sample = [random.choice(values)[1] for idx in range(lookups)]
+
+            o.writeln('{0} tokens, {1} lookups'.format(tokens, lookups))
+            o.writeln('formatted, no index: {0:.1f} us'.format(self.measure(connection, sample, False)))
+
+            connection.execute("CREATE INDEX auth_tokens_token ON auth_tokens(token)")
+            o.writeln('formatted, indexed:  {0:.1f} us'.format(self.measure(connection, sample, False)))
+            o.writeln('bound, indexed:      {0:.1f} us'.format(self.measure(connection, sample, True)))
+            connection.close()
+        finally:
+            shutil.rmtree(folder)
+
+    def measure(self, connection, sample, bound):
+        """
+        Returns the mean latency of a lookup in microseconds
+        """
+        start = time.time()
+        for token in sample:
+            if bound:
+                expression = QueryExpression().fromTable('auth_tokens').where('token', '=', token)
+                result = connection.execute(expression.toSQL(), expression.params()).fetchall()
+            else:
+                # The query text which was built before values were bound
+                sql = "SELECT * FROM auth_tokens WHERE token = '{0}'".format(token)
+                result = connection.execute(sql).fetchall()
+            assert len(result) == 1
+
+        return (time.time() - start) * 1000000 / len(sample)
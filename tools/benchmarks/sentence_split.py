@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import time
+import codecs
+
+from cleo import Command, InputArgument, InputOption
+from src.core import tokenizer
+from tools.benchmarks.tokenizer import sample
+
+
+class SentenceSplitBenchmark(Command):
+
+    name = 'benchmark:sentence-split'
+
+    description = 'Checks that the vectorised sentence splitting matches the token by token one and measures both'
+
+    arguments = [
+        {
+            'name': 'lang',
+            'description': 'Language of the tokenizer (hr, sr or sl)',
+            'required': True
+        }
+    ]
+
+    options = [
+        {
+            'name': 'file',
+            'description': 'UTF-8 text file split line by line, a generated sample if not given',
+            'value_required': True
+        },
+        {
+            'name': 'lines',
+            'description': 'Number of lines of the generated sample',
+            'value_required': True,
+            'default': 20000
+        }
+    ]
+
+    def __init__(self):
+        super(SentenceSplitBenchmark, self).__init__()
+
+    def execute(self, i, o):
+        """
+        Executes the command.
+
+        :type i: cleo.inputs.input.Input
+        :type o: cleo.outputs.output.Output
+        """
+
+        lang = i.get_argument('lang')
+        if lang not in tokenizer.langs:
+            o.writeln('<error>Unknown language {0}</error>'.format(lang))
+            return 1
+        if not tokenizer.load_numpy():
+            o.writeln('<error>NumPy is not installed</error>')
+            return 1
+
+        if i.get_option('file'):
+            with codecs.open(i.get_option('file'), encoding='utf-8') as f:
+                lines = f.readlines()
+        else:
+            lines = sample(lang, int(i.get_option('lines')))
+
+        # The character classes are built on first use
+        tokenizer.split_marks([(u'.', 0, 1)], lang, tokenizer.is_boundary)
+
+        token_re = tokenizer.generate_tokenizer(lang)
+        paragraphs = [tokenizer.tokenize(token_re, line) for line in lines]
+        # The whole sample as one stream, as it is split by the segmenter
+        stream = tokenizer.tokenize(token_re, u' '.join(line.strip() for line in lines))
+        o.writeln('{0} lines, {1} tokens'.format(len(lines), len(stream)))
+
+        for mode, boundary in (('standard', tokenizer.is_boundary), ('nonstandard', tokenizer.is_boundary_nonstd)):
+            # Lines below the size threshold are split by the loop, as the segmenter does
+            times = []
+            for split in (tokenizer.split_at, tokenizer.split):
+                start = time.time()
+                sentences = [split(tokens, lang, boundary) for tokens in paragraphs]
+                times.append(time.time() - start)
+                if split is tokenizer.split_at:
+                    expected = sentences
+                elif sentences != expected:
+                    o.writeln('<error>{0}: the sentences of the lines differ</error>'.format(mode))
+                    return 1
+            self.report(o, mode + ', lines:', times)
+
+            times = []
+            for split in (tokenizer.split_at, tokenizer.split_marks):
+                start = time.time()
+                sentences = split(stream, lang, boundary)
+                times.append(time.time() - start)
+                if split is tokenizer.split_at:
+                    expected = sentences
+                elif sentences != expected:
+                    o.writeln('<error>{0}: the sentences of the text differ</error>'.format(mode))
+                    return 1
+            self.report(o, mode + ', text:', times)
+
+            times = []
+            for split in (tokenizer.iter_split_at, tokenizer.iter_split_marks):
+                start = time.time()
+                sentences = list(split(iter(stream), lang, boundary))
+                times.append(time.time() - start)
+                if sentences != expected:
+                    o.writeln('<error>{0}: the sentences of the stream differ</error>'.format(mode))
+                    return 1
+            self.report(o, mode + ', stream:', times)
+
+        o.writeln('identical sentences in both modes')
+
+    def report(self, o, label, times):
+        o.writeln('{0:<20} loop {1:.3f} s, vectorised {2:.3f} s, speedup {3:.1f}x'.format(
+            label, times[0], times[1], times[0] / max(times[1], 1e-9)))
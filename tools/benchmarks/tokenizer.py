@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import codecs
+
+from cleo import Command, InputArgument, InputOption
+from src.core import tokenizer
+
+# Pieces of the generated sample besides the abbreviations of the language
+PIECES = [u'beseda', u'Beseda', u'riječ', u'ČŽŠ', u'x-y', u'**a**', u'12', u'3.14', u'12.3.', u'-5', u'1:2',
+          u'http://www.janes.si/a.b', u'janes.si', u'ime@janes.si', u'#oznaka', u'@ime', u':)', u':-(', u'^_^',
+          u'<3', u'&amp;', u'<b>', u'->', u'.', u',', u'!', u'?', u'…', u'...', u'!!', u'"', u'»', u'(', u')']
+
+
+def sample(lang, lines):
+    """
+    Generates lines mixing the abbreviations of the language in both cases with the other token classes
+    """
+    random.seed(0)
+    pieces = PIECES + [e.replace('\\', '') for e in tokenizer.abbrev_order[lang]]
+    pieces = pieces + [e.capitalize() for e in pieces]
+    generated = []
+    for idx in range(lines):
+        tokens = [random.choice(pieces) for n in range(random.randint(5, 30))]
+        generated.append(u''.join(e + random.choice([u' ', u' ', u' ', u'', u'  ']) for e in tokens))
+    return generated
+
+
+class TokenizerBenchmark(Command):
+
+    name = 'benchmark:tokenizer'
+
+    description = 'Checks that the tokenizer matches the plain alternation tokenizer and measures both'
+
+    arguments = [
+        {
+            'name': 'lang',
+            'description': 'Language of the tokenizer (hr, sr or sl)',
+            'required': True
+        }
+    ]
+
+    options = [
+        {
+            'name': 'file',
+            'description': 'UTF-8 text file tokenized line by line, a generated sample if not given',
+            'value_required': True
+        },
+        {
+            'name': 'lines',
+            'description': 'Number of lines of the generated sample',
+            'value_required': True,
+            'default': 20000
+        }
+    ]
+
+    def __init__(self):
+        super(TokenizerBenchmark, self).__init__()
+
+    def execute(self, i, o):
+        """
+        Executes the command.
+
+        :type i: cleo.inputs.input.Input
+        :type o: cleo.outputs.output.Output
+        """
+
+        lang = i.get_argument('lang')
+        if lang not in tokenizer.langs:
+            o.writeln('<error>Unknown language {0}</error>'.format(lang))
+            return 1
+
+        if i.get_option('file'):
+            with codecs.open(i.get_option('file'), encoding='utf-8') as f:
+                lines = f.readlines()
+        else:
+            lines = sample(lang, int(i.get_option('lines')))
+
+        start = time.time()
+        reference = tokenizer.reference_tokenizer(lang)
+        optimized = tokenizer.generate_tokenizer(lang)
+        o.writeln('compiled in {0:.1f} ms'.format((time.time() - start) * 1000))
+
+        reference_tokens, reference_time = self.measure(reference, lines)
+        tokens, optimized_time = self.measure(optimized, lines)
+
+        if tokens != reference_tokens:
+            for line, expected, actual in zip(lines, reference_tokens, tokens):
+                if expected != actual:
+                    o.writeln(u'<error>Tokens differ on line: {0}</error>'.format(line.strip()).encode('utf-8'))
+                    break
+            return 1
+
+        o.writeln('{0} lines, {1} tokens, identical output'.format(len(lines), sum(len(e) for e in tokens)))
+        o.writeln('alternation: {0:.3f} s'.format(reference_time))
+        o.writeln('trie:        {0:.3f} s'.format(optimized_time))
+        o.writeln('speedup:     {0:.1f}x'.format(reference_time / max(optimized_time, 1e-9)))
+
+    def measure(self, token_re, lines):
+        """
+        Returns the tokens of every line and the seconds it took to tokenize them
+        """
+        start = time.time()
+        tokens = [tokenizer.tokenize(token_re, line) for line in lines]
+        return tokens, time.time() - start
@@ -3,6 +3,7 @@ from cleo import Command, InputArgument, InputOption
 
 from src.db.users_db import UsersDB
 from src.models.user_model import UserModel
+from src.auth_cache import AuthCache
 
 
 class ResetDB(Command):
@@ -27,7 +28,8 @@ class ResetDB(Command):
         """
         
         UsersDB.getInstance().reset()
-        
+        AuthCache.notify()
+
         user = UserModel()
         user.username = 'admin'
         user.email = 'admin@admin.com'
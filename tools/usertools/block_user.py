@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from cleo import Command, InputArgument, InputOption
+from src.models.user_model import UserModel
+from src.auth_cache import AuthCache
+
+class BlockUserByUsernameCommand(Command):
+
+    name = 'user:block'
+
+    description = 'Blocks a user'
+
+    arguments = [
+        {
+            'name': 'username',
+            'description': 'Username',
+            'required': True
+        }
+    ]
+
+    def __init__(self):
+        super(BlockUserByUsernameCommand, self).__init__()
+
+    def execute(self, i, o):
+        """
+        Executes the command.
+
+        :type i: cleo.inputs.input.Input
+        :type o: cleo.outputs.output.Output
+        """
+
+        # Read parameters
+        user = UserModel.getByUsername(i.get_argument('username'))
+        user.block()
+        user.save()
+
+        # Running servers drop their cached tokens
+        AuthCache.notify()
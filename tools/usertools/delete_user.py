@@ -2,6 +2,7 @@
 
 from cleo import Command, InputArgument, InputOption
 from src.models.user_model import UserModel
+from src.auth_cache import AuthCache
 
 class DeleteUserByUsernameCommand(Command):
 
@@ -31,3 +32,6 @@ class DeleteUserByUsernameCommand(Command):
         # Read parameters
         user = UserModel.getByUsername(i.get_argument('username'))
         user.delete()
+
+        # Running servers drop their cached tokens
+        AuthCache.notify()